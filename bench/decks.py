@@ -0,0 +1,64 @@
+"""
+decks.py - ProxyForge representative benchmark decks
+
+Deck lists in the formats users paste, drawn from scryfall_stub's synthetic
+catalog so every card resolves offline:
+
+  - constructed-60   : playsets and basics; a few printings given as
+                       "(set) number", one line per copy count style
+  - commander-100    : singleton with basics, URL-import [scryfall:<id>]
+                       tags, a misspelt name (fuzzy lookup) and a few DFCs
+  - cube-360         : 360 distinct cards, one in ten double-faced
+  - dfc-heavy-60     : double-faced playsets, so every sheet has real backs
+"""
+
+from scryfall_stub import BASICS, synthetic_catalog
+
+
+def _typo(name: str) -> str:
+    """Drop one letter from the middle of the first word."""
+    first, _, rest = name.partition(" ")
+    cut = len(first) // 2
+    return f"{first[:cut]}{first[cut + 1:]} {rest}".strip()
+
+
+def decks() -> dict[str, str]:
+    """Name → deck list text."""
+    catalog = synthetic_catalog()
+    singles = [c for c in catalog if "card_faces" not in c and c["name"] not in BASICS]
+    flips   = [c for c in catalog if "card_faces" in c]
+
+    constructed = []
+    for i, card in enumerate(singles[:9]):
+        if i % 3 == 0:
+            constructed.append(f"4 {card['name']} ({card['set'].upper()}) {card['collector_number']}")
+        else:
+            constructed.append(f"{'4x' if i % 2 else '4'} {card['name']}")
+    constructed += ["12 Island", "12 Mountain"]
+
+    commander = ["// Commander", f"1 {singles[100]['name']}", "", "// Deck"]
+    for i, card in enumerate(singles[101:161]):
+        if i < 3:
+            commander.append(f"1 {card['name']} ({card['set']}) {card['collector_number']} "
+                             f"[scryfall:{card['id']}]")
+        elif i < 8:
+            commander.append(f"1 {card['name']} ({card['set']}) {card['collector_number']}")
+        elif i == 8:
+            commander.append(f"1 {_typo(card['name'])}")
+        else:
+            commander.append(f"1 {card['name']}")
+    commander += [f"1 {card['name']}" for card in flips[:4]]
+    commander += [f"7 {basic}" for basic in BASICS]
+
+    cube = [f"1 {card['name']}" for card in singles[:324]]
+    cube += [f"1 {card['name']}" for card in flips[:36]]
+
+    dfc_heavy = [f"4 {card['name']}" for card in flips[40:50]]
+    dfc_heavy += ["10 Forest", "10 Swamp"]
+
+    return {
+        "constructed-60": "\n".join(constructed),
+        "commander-100":  "\n".join(commander),
+        "cube-360":       "\n".join(cube),
+        "dfc-heavy-60":   "\n".join(dfc_heavy),
+    }
@@ -0,0 +1,361 @@
+"""
+run.py - ProxyForge offline benchmark suite
+
+    python bench/run.py [--decks cube-360,commander-100] [--iterations 5]
+                        [--latency-ms 20] [--rate-limit 0.02]
+                        [--out bench-results.json] [--compare previous.json]
+
+Starts scryfall_stub on a local port, then measures every deck from
+bench/decks.py in fresh worker processes (empty caches, separate peak RSS):
+
+  - pipeline : parse_deck_list throughput; fetch_all_cards cold (empty
+               caches) and warm as cards/sec, with the API calls, 429s and
+               image downloads it took; build_pdf sheets/sec per backend
+               (first run with cold tiles, then the median)
+  - e2e      : POST /api/pdf and /api/download against a real uvicorn
+               server; the first, cold request is reported on its own and
+               p50 / p95 are taken over the warm repeats
+  - startup  : what a fresh (serverless) instance costs the first visitor:
+               `import main`, server boot, the first GET / and its 304
+               revalidation, then the first POST /api/preview. Set
+               PROXYFORGE_WARMUP=0 to measure without the background warm-up
+
+Each stage records the worker's peak RSS. The result cache is disabled so
+repeats measure the pipeline rather than a file send.
+
+Results are JSON. --compare diffs against an earlier file and exits 1 when
+a rate, time or RSS metric regressed by more than --threshold percent.
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR  = BENCH_DIR.parent
+sys.path[:0] = [str(BENCH_DIR), str(REPO_DIR)]
+
+from decks import decks  # noqa: E402
+
+SCHEMA = 1
+STAGES = ("pipeline", "e2e", "startup")
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+def _stub_stats(stub_url: str) -> dict:
+    parts = urllib.parse.urlsplit(stub_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+    conn.request("GET", "/_stats")
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+    return stats
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lo, hi = int(rank), min(int(rank) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (rank - lo)
+
+
+# ── Worker stages (run in a child process) ───────────────────────────────────
+def stage_pipeline(text: str, iterations: int, stub_url: str) -> dict:
+    import main
+    from pdf_gen import build_pdf, plan_sheets
+
+    out = {}
+    parsed = main.parse_deck_list(text)
+    lines  = len(text.splitlines())
+    runs   = max(50, 20_000 // max(1, lines))
+    started = time.perf_counter()
+    for _ in range(runs):
+        main.parse_deck_list(text)
+    elapsed = time.perf_counter() - started
+    out["parse"] = {"decks_per_s": round(runs / elapsed, 1), "lines_per_s": round(runs * lines / elapsed)}
+    out["cards"], out["unique"] = sum(c["qty"] for c in parsed), len(parsed)
+
+    tiers = main.image_tiers(main.IMAGE_POLICY, 300, main.IMAGE_PPI_SLACK)
+    before = _stub_stats(stub_url)
+    started = time.perf_counter()
+    fronts, backs, report, summary = asyncio.run(main.fetch_all_cards(text, as_paths=True, tiers=tiers))
+    elapsed = time.perf_counter() - started
+    after = _stub_stats(stub_url)
+    out["resolve_cold"] = {
+        "seconds": round(elapsed, 3), "cards_per_s": round(len(report) / elapsed, 1),
+        "errors": summary["errors"], "api_calls": after["api"] - before["api"],
+        "rate_limited": after["rate_limited"] - before["rate_limited"],
+        "downloads": after["images"] - before["images"], "rss_mb": _peak_rss_mb(),
+    }
+
+    times = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        asyncio.run(main.fetch_all_cards(text, as_paths=True, tiers=tiers))
+        times.append(time.perf_counter() - started)
+    out["resolve_warm"] = {"seconds": round(statistics.median(times), 4),
+                           "cards_per_s": round(len(report) / statistics.median(times), 1)}
+
+    fronts_ok = [f for f in fronts if f is not None]
+    backs_ok  = [b for f, b in zip(fronts, backs) if f is not None]
+    sheets    = len(plan_sheets(fronts_ok, backs_ok))
+    for backend in ("raster", "embed"):
+        times, size = [], 0
+        for _ in range(max(2, iterations)):
+            started = time.perf_counter()
+            size = len(build_pdf(fronts_ok, backs_ok, backend=backend))
+            times.append(time.perf_counter() - started)
+        warm = statistics.median(times[1:])
+        out[f"render_{backend}"] = {
+            "sheets": sheets, "first_s": round(times[0], 3), "seconds": round(warm, 3),
+            "sheets_per_s": round(sheets / warm, 2), "pdf_mb": round(size / 1024 ** 2, 2),
+            "rss_mb": _peak_rss_mb(),
+        }
+    return out
+
+
+def _start_server(app):
+    """Run `app` under uvicorn on a free port; returns (server, thread, port)."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, server.servers[0].sockets[0].getsockname()[1]
+
+
+def _http(port: int, method: str, path: str, body: bytes | None = None,
+          headers: dict | None = None, status: int = 200) -> tuple[float, int, dict]:
+    """(seconds, body size, headers) of one request, draining the body as it arrives."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    started = time.perf_counter()
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    size = 0
+    while chunk := resp.read(1 << 16):   # drain without holding it, so RSS is the server's
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    if resp.status != status:
+        raise RuntimeError(f"{method} {path} answered {resp.status}")
+    return elapsed, size, {k.lower(): v for k, v in resp.getheaders()}
+
+
+def _form(text: str) -> tuple[bytes, dict]:
+    return (urllib.parse.urlencode({"deck_list": text}).encode(),
+            {"Content-Type": "application/x-www-form-urlencoded"})
+
+
+def stage_e2e(text: str, iterations: int, stub_url: str) -> dict:
+    import main
+
+    server, thread, port = _start_server(main.app)
+    body, headers = _form(text)
+
+    def request(path: str) -> tuple[float, int]:
+        elapsed, size, _ = _http(port, "POST", path, body, headers)
+        return elapsed, size
+
+    out = {}
+    try:
+        for name, path in (("pdf", "/api/pdf"), ("download", "/api/download")):
+            cold, size = request(path)
+            warm = [request(path)[0] for _ in range(iterations)]
+            out[name] = {
+                "cold_s": round(cold, 3),
+                "p50_ms": round(_percentile(warm, 50) * 1000, 1),
+                "p95_ms": round(_percentile(warm, 95) * 1000, 1),
+                "mb": round(size / 1024 ** 2, 2), "rss_mb": _peak_rss_mb(),
+            }
+    finally:
+        server.should_exit = True
+        thread.join(10)
+    return out
+
+
+def stage_startup(text: str, iterations: int, stub_url: str) -> dict:
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+    server, thread, port = _start_server(main.app)
+    booted = time.perf_counter()
+
+    out = {"import_ms": round((imported - started) * 1000, 1),
+           "boot_ms": round((booted - imported) * 1000, 1)}
+    try:
+        gzip = {"Accept-Encoding": "gzip"}
+        first, size, headers = _http(port, "GET", "/", headers=gzip)
+        revalidate = [_http(port, "GET", "/", headers={**gzip, "If-None-Match": headers["etag"]},
+                            status=304)[0] for _ in range(max(1, iterations))]
+        body, form = _form(text)
+        preview, _, _ = _http(port, "POST", "/api/preview", body, form)
+        out.update({
+            "index_first_ms": round(first * 1000, 1),
+            "index_304_ms": round(statistics.median(revalidate) * 1000, 2),
+            "index_kb": round(size / 1024, 1),
+            "preview_first_s": round(preview, 3),
+            "rss_mb": _peak_rss_mb(),
+        })
+    finally:
+        server.should_exit = True
+        thread.join(10)
+    return out
+
+
+def worker(args) -> int:
+    text   = decks()[args.worker]
+    stages = {"pipeline": stage_pipeline, "e2e": stage_e2e, "startup": stage_startup}
+    result = stages[args.stage](text, args.iterations, args.stub)
+    result["rss_mb"] = _peak_rss_mb()
+    print(json.dumps(result))
+    return 0
+
+
+# ── Orchestration ────────────────────────────────────────────────────────────
+def run_stage(deck: str, stage: str, args, stub_url: str) -> dict:
+    with tempfile.TemporaryDirectory(prefix="proxyforge-bench-") as cache_dir:
+        env = {**os.environ,
+               "PROXYFORGE_SCRYFALL_API":    stub_url,
+               "PROXYFORGE_CACHE_DIR":       cache_dir,
+               "PROXYFORGE_RESULT_CACHE_MB": "0"}
+        env.pop("PROXYFORGE_BULK_INDEX", None)
+        env.pop("PROXYFORGE_TILE_CACHE_DIR", None)
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", deck, "--stage", stage,
+             "--stub", stub_url, "--iterations", str(args.iterations)],
+            env=env, cwd=REPO_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{deck}/{stage} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict) -> dict[str, float]:
+    """deck.stage.metric → value, for comparing runs."""
+    flat = {}
+
+    def walk(prefix, node):
+        for k, v in node.items():
+            if isinstance(v, dict):
+                walk(f"{prefix}{k}.", v)
+            elif isinstance(v, (int, float)):
+                flat[f"{prefix}{k}"] = v
+    walk("", results["decks"])
+    return flat
+
+
+def _direction(metric: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if informational."""
+    name = metric.rsplit(".", 1)[-1]
+    if name.endswith("_per_s"):
+        return 1
+    if name.endswith(("_s", "_ms")) or name in ("seconds", "rss_mb"):
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold: float) -> list[str]:
+    """Print metric changes; return the metrics that regressed past threshold."""
+    before, after = flatten(old), flatten(new)
+    regressions = []
+    print(f"\n{'metric':<48}{'before':>12}{'after':>12}{'change':>10}")
+    for metric in sorted(set(before) & set(after)):
+        direction = _direction(metric)
+        if not direction or not before[metric]:
+            continue
+        change = (after[metric] - before[metric]) / before[metric] * 100
+        worse  = change * direction < -threshold
+        flag   = "  REGRESSION" if worse else ""
+        print(f"{metric:<48}{before[metric]:>12}{after[metric]:>12}{change:>+9.1f}%{flag}")
+        if worse:
+            regressions.append(metric)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline ProxyForge benchmarks.")
+    parser.add_argument("--decks", default="all", help="comma-separated deck names, or 'all'")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated: pipeline, e2e, startup")
+    parser.add_argument("--iterations", type=int, default=5, help="warm repeats per measurement")
+    parser.add_argument("--latency-ms", type=float, default=20, help="stub API latency")
+    parser.add_argument("--image-latency-ms", type=float, default=5, help="stub image latency")
+    parser.add_argument("--rate-limit", type=float, default=0.02, help="share of API requests answered 429")
+    parser.add_argument("--out", default="bench-results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold, percent")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--stage", help=argparse.SUPPRESS)
+    parser.add_argument("--stub", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.worker:
+        return worker(args)
+
+    from scryfall_stub import serve
+
+    available = decks()
+    names  = list(available) if args.decks == "all" else args.decks.split(",")
+    stages = args.stages.split(",")
+    unknown = [n for n in names if n not in available] + [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown deck or stage: {', '.join(unknown)}")
+
+    stub = serve(latency_ms=args.latency_ms, image_latency_ms=args.image_latency_ms,
+                 rate_limit=args.rate_limit)
+    results = {
+        "schema": SCHEMA,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {"iterations": args.iterations, "latency_ms": args.latency_ms,
+                   "image_latency_ms": args.image_latency_ms, "rate_limit": args.rate_limit},
+        "decks": {},
+    }
+    try:
+        for name in names:
+            results["decks"][name] = {}
+            for stage in stages:
+                started = time.monotonic()
+                results["decks"][name][stage] = run_stage(name, stage, args, stub.base_url)
+                print(f"{name:<16}{stage:<10}{time.monotonic() - started:6.1f}s", file=sys.stderr)
+    finally:
+        stub.shutdown()
+
+    Path(args.out).write_text(json.dumps(results, indent=2) + "\n")
+    print(json.dumps(results["decks"], indent=2))
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text()), results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold}%",
+                  file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
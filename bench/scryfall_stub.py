@@ -0,0 +1,307 @@
+"""
+scryfall_stub.py - ProxyForge offline Scryfall stand-in for benchmarks
+
+Serves the parts of api.scryfall.com and cards.scryfall.io that main.py
+uses, so the fetch pipeline can be measured without the network:
+
+    python bench/scryfall_stub.py --port 8765 --latency-ms 50 --rate-limit 0.05
+    PROXYFORGE_SCRYFALL_API=http://127.0.0.1:8765 uvicorn main:app
+
+  - GET /cards/<id>, /cards/<set>/<number>, /cards/named?fuzzy=<name> and
+    POST /cards/collection; unknown cards get the real API's 404 / not_found
+  - Cards come from a recorded JSON array of Scryfall card objects (--cards,
+    e.g. a slice of a bulk data file) or from a synthetic catalog that
+    bench/decks.py draws its decks from; image_uris point back at this server
+  - GET /img/<id>/<face>/<size> returns a noisy card image with that tier's
+    real pixel size and format. A few base images per size are encoded at
+    startup; each card gets a unique trailer so content-addressed caches see
+    one blob per card, as with the real CDN
+  - --latency-ms / --image-latency-ms delay every response; --rate-limit
+    answers that share of API requests with 429 and Retry-After
+  - GET /_stats returns request counters, for runners to diff
+"""
+
+import argparse
+import difflib
+import io
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+# Scryfall's image tiers: pixel size and format.
+TIERS = {"png": ((745, 1040), "PNG"), "large": ((672, 936), "JPEG"),
+         "normal": ((488, 680), "JPEG"), "small": ((146, 204), "JPEG")}
+_VARIANTS = 8
+_NAMESPACE = uuid.UUID("4b1d0c6e-52f4-4c39-9a4e-3f0c2f9a7b10")
+BASICS = ("Plains", "Island", "Swamp", "Mountain", "Forest")
+
+_ADJECTIVES = ("Arcane", "Verdant", "Ashen", "Gilded", "Hollow", "Sunlit", "Feral", "Silent",
+               "Molten", "Tidal", "Grim", "Radiant", "Thorned", "Storm", "Ancient", "Restless",
+               "Crimson", "Frozen", "Shattered", "Wandering", "Hallowed", "Sunken", "Iron",
+               "Whispering", "Blighted", "Celestial", "Savage", "Gleaming", "Drowned", "Errant")
+_NOUNS = ("Signet", "Familiar", "Bastion", "Oracle", "Warden", "Tithe", "Revenant", "Monolith",
+          "Herald", "Conduit", "Harvester", "Apostle", "Charm", "Colossus", "Visionary",
+          "Pathway", "Sentinel", "Recluse", "Engine", "Scholar", "Tyrant", "Reliquary",
+          "Skirmisher", "Augur", "Wellspring")
+
+
+def _normalise(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def _card_id(name: str) -> str:
+    return str(uuid.uuid5(_NAMESPACE, name))
+
+
+def synthetic_catalog(singles: int = 400, flips: int = 80) -> list[dict]:
+    """Deterministic card objects (without image_uris): basics, singles, then DFCs."""
+    names = [f"{a} {n}" for n in _NOUNS for a in _ADJECTIVES]
+    for i, name in enumerate(names):
+        if i % 9 == 4:
+            names[i] = f"{name}'s Bargain"
+        elif i % 13 == 6:
+            names[i] = f"{name}, the Unbroken"
+    if singles + 2 * flips > len(names):
+        raise ValueError(f"at most {len(names)} synthetic names")
+    cards = []
+    for name in BASICS:
+        cards.append({"name": name, "layout": "normal"})
+    for name in names[:singles]:
+        cards.append({"name": name, "layout": "normal"})
+    for i in range(flips):
+        front, back = names[singles + 2 * i], names[singles + 2 * i + 1]
+        cards.append({"name": f"{front} // {back}", "layout": "transform" if i % 2 else "modal_dfc",
+                      "card_faces": [{"name": front}, {"name": back}]})
+    for number, card in enumerate(cards, 1):
+        card.update(object="card", id=_card_id(card["name"]), set="bnc",
+                    collector_number=str(number), image_status="highres_scan", highres_image=True)
+    return cards
+
+
+class Catalog:
+    """Card lookup tables plus the image bytes served for them."""
+
+    def __init__(self, cards: list[dict], base_url: str):
+        self.cards, self.by_id, self.by_print, self.by_name = [], {}, {}, {}
+        for card in cards:
+            card = dict(card)
+            faces = card.get("card_faces") or []
+            if len(faces) > 1 and not card.get("image_uris"):
+                card["card_faces"] = [{**face, "image_uris": self._uris(base_url, card["id"], i)}
+                                      for i, face in enumerate(faces)]
+            else:
+                card["image_uris"] = self._uris(base_url, card["id"], 0)
+            self.cards.append(card)
+            self.by_id[card["id"]] = card
+            self.by_print[(card.get("set", "").lower(), str(card.get("collector_number", "")))] = card
+            self.by_name.setdefault(_normalise(card["name"]), card)
+            for face in card.get("card_faces", []):
+                self.by_name.setdefault(_normalise(face.get("name", "")), card)
+        # Rendered up front so no request pays for it and skews a timing.
+        self._bases = {size: [self._render(size, v) for v in range(_VARIANTS)] for size in TIERS}
+
+    @staticmethod
+    def _uris(base_url: str, card_id: str, face: int) -> dict:
+        return {size: f"{base_url}/img/{card_id}/{face}/{size}?1700000000" for size in TIERS}
+
+    def fuzzy(self, name: str) -> dict | None:
+        key = _normalise(name)
+        if key in self.by_name:
+            return self.by_name[key]
+        for candidate, card in self.by_name.items():
+            if candidate.startswith(key) or key.startswith(candidate):
+                return card
+        close = difflib.get_close_matches(key, self.by_name, n=1, cutoff=0.8)
+        return self.by_name[close[0]] if close else None
+
+    def image(self, card_id: str, face: int, size: str) -> bytes:
+        base = self._bases[size][zlib.crc32(f"{card_id}/{face}".encode()) % _VARIANTS]
+        # Decoders stop at the end-of-image marker; the trailer only makes
+        # each card's bytes (and so its content hash) unique.
+        return base + f"{card_id}/{face}".encode()
+
+    @staticmethod
+    def _render(size: str, variant: int) -> bytes:
+        (w, h), fmt = TIERS[size]
+        rng   = random.Random(variant)
+        base  = Image.new("RGB", (w, h), tuple(rng.randrange(40, 216) for _ in range(3)))
+        noise = Image.effect_noise((w, h), 48).convert("RGB")
+        img   = Image.blend(base, noise, 0.3)
+        buf   = io.BytesIO()
+        img.save(buf, fmt, **({"quality": 88} if fmt == "JPEG" else {}))
+        return buf.getvalue()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, cards: list[dict] | None = None, latency_ms: float = 0,
+                 image_latency_ms: float = 0, rate_limit: float = 0, retry_after: int = 0,
+                 seed: int = 0):
+        super().__init__(addr, _Handler)
+        host, port = self.server_address[:2]
+        self.base_url         = f"http://{host}:{port}"
+        self.catalog          = Catalog(cards if cards is not None else synthetic_catalog(), self.base_url)
+        self.latency          = latency_ms / 1000
+        self.image_latency    = image_latency_ms / 1000
+        self.rate_limit       = rate_limit
+        self.retry_after      = retry_after
+        self._rng             = random.Random(seed)
+        self._lock            = threading.Lock()
+        self.counters         = {"api": 0, "collection": 0, "images": 0, "image_bytes": 0,
+                                 "rate_limited": 0, "not_found": 0}
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def throttled(self) -> bool:
+        with self._lock:
+            return self.rate_limit > 0 and self._rng.random() < self.rate_limit
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StubServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json",
+              headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, obj) -> None:
+        self._send(status, json.dumps(obj).encode())
+
+    def _not_found(self) -> None:
+        self.server.count("not_found")
+        self._json(404, {"object": "error", "code": "not_found", "status": 404,
+                         "details": "No card found with the given identifier."})
+
+    def _api_gate(self) -> bool:
+        """Latency and 429 injection for API routes; False if answered with 429."""
+        self.server.count("api")
+        time.sleep(self.server.latency)
+        if self.server.throttled():
+            self.server.count("rate_limited")
+            self._send(429, b'{"object":"error","status":429}',
+                       headers={"Retry-After": str(self.server.retry_after)})
+            return False
+        return True
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path)
+        path  = [urllib.parse.unquote(p) for p in parts.path.split("/") if p]
+        cat   = self.server.catalog
+
+        if path == ["_stats"]:
+            return self._json(200, self.server.stats())
+        if len(path) == 4 and path[0] == "img" and path[3] in TIERS:
+            time.sleep(self.server.image_latency)
+            if path[1] not in cat.by_id:
+                return self._not_found()
+            body = cat.image(path[1], int(path[2]), path[3])
+            self.server.count("images")
+            self.server.count("image_bytes", len(body))
+            return self._send(200, body, "image/png" if path[3] == "png" else "image/jpeg")
+        if not path or path[0] != "cards":
+            return self._not_found()
+        if not self._api_gate():
+            return
+
+        card = None
+        if path == ["cards", "named"]:
+            query = urllib.parse.parse_qs(parts.query)
+            name  = (query.get("fuzzy") or query.get("exact") or [""])[0]
+            card  = cat.fuzzy(name) if "fuzzy" in query else cat.by_name.get(_normalise(name))
+        elif len(path) == 2:
+            card = cat.by_id.get(path[1].lower())
+        elif len(path) == 3:
+            card = cat.by_print.get((path[1].lower(), path[2]))
+        if card is None:
+            return self._not_found()
+        self._json(200, card)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.split("?")[0] != "/cards/collection":
+            return self._not_found()
+        if not self._api_gate():
+            return
+        self.server.count("collection")
+        try:
+            idents = json.loads(body)["identifiers"]
+        except (ValueError, KeyError, TypeError):
+            return self._json(400, {"object": "error", "status": 400})
+        if len(idents) > 75:
+            return self._json(422, {"object": "error", "status": 422,
+                                    "details": "Too many identifiers (max 75)."})
+        cat, data, missing = self.server.catalog, [], []
+        for ident in idents:
+            if "id" in ident:
+                card = cat.by_id.get(str(ident["id"]).lower())
+            elif "set" in ident:
+                card = cat.by_print.get((ident["set"].lower(), str(ident.get("collector_number"))))
+            else:
+                card = cat.by_name.get(_normalise(ident.get("name", "")))
+            if card is not None:
+                data.append(card)
+            else:
+                missing.append(ident)
+        self._json(200, {"object": "list", "not_found": missing, "data": data})
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, **options) -> StubServer:
+    """Start a StubServer on a daemon thread and return it (port 0 picks one)."""
+    server = StubServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline Scryfall stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cards", help="recorded Scryfall card objects (JSON array) to serve")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay per API response")
+    parser.add_argument("--image-latency-ms", type=float, default=0, help="delay per image response")
+    parser.add_argument("--rate-limit", type=float, default=0, help="share of API requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args(argv)
+
+    cards = None
+    if args.cards:
+        with open(args.cards, encoding="utf-8") as f:
+            cards = [c for c in json.load(f) if c.get("object", "card") == "card" and c.get("id")]
+    server = StubServer((args.host, args.port), cards=cards, latency_ms=args.latency_ms,
+                        image_latency_ms=args.image_latency_ms, rate_limit=args.rate_limit,
+                        retry_after=args.retry_after)
+    print(f"Serving {len(server.catalog.cards)} cards on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
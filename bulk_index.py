@@ -0,0 +1,217 @@
+"""
+bulk_index.py - ProxyForge offline card index built from Scryfall bulk data
+
+Resolves cards with no per-card network traffic, from a local snapshot of
+Scryfall's `default_cards` / `all_cards` bulk file:
+
+    python bulk_index.py ingest default-cards.json [--index PATH]
+
+  - The bulk JSON array is parsed incrementally, one card object at a time,
+    so multi-hundred-MB files never sit in memory whole (.json.gz works too)
+  - Cards are stored slimmed (card_cache.slim_card) in SQLite, keyed by
+    Scryfall id, with indexes on (set, collector number) and on normalised
+    card and face names, so FLIP_LAYOUTS handling sees the same fields
+  - Each name maps to one preferred printing: paper over digital, non-promo,
+    high-res scans, then the most recent release
+  - Ingest builds a fresh file and os.replace()s it over the old index;
+    readers reopen it when the file changes, without a restart
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import IO, Iterator
+
+from card_cache import slim_card
+from names import normalise
+
+_RECHECK_SECONDS = 60
+_BATCH           = 2000
+
+
+def iter_json_array(fp: IO[str], chunk_size: int = 1 << 20) -> Iterator[dict]:
+    """Yield the elements of a top-level JSON array without reading it whole."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof, started = "", 0, False, False
+    while True:
+        if pos >= len(buf):
+            if eof:
+                return
+            chunk = fp.read(chunk_size)
+            eof   = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        ch = buf[pos]
+        if ch.isspace() or ch == ",":
+            pos += 1
+            continue
+        if ch == "[" and not started:
+            started = True
+            pos += 1
+            continue
+        if ch == "]":
+            return
+        try:
+            obj, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = fp.read(chunk_size)
+            eof   = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        yield obj
+
+
+def _name_rank(card: dict) -> str:
+    """Sortable preference for which printing a bare card name resolves to."""
+    return "".join((
+        "0" if card.get("digital") else "1",
+        "0" if card.get("promo") else "1",
+        "1" if card.get("highres_image") else "0",
+        card.get("released_at", "0000-00-00"),
+    ))
+
+
+def ingest(src: str | Path, index_path: str | Path) -> int:
+    """Build a fresh index at `index_path` from a bulk data file; return card count."""
+    src, index_path = Path(src), Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = index_path.with_name(index_path.name + ".building")
+    tmp.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp)
+    conn.executescript(
+        "PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;"
+        "CREATE TABLE cards (id TEXT PRIMARY KEY, set_code TEXT, cn TEXT, data TEXT NOT NULL);"
+        "CREATE TABLE names (name TEXT PRIMARY KEY, id TEXT NOT NULL, rank TEXT NOT NULL);"
+    )
+    upsert_name = (
+        "INSERT INTO names (name, id, rank) VALUES (?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET id = excluded.id, rank = excluded.rank "
+        "WHERE excluded.rank > names.rank"
+    )
+
+    opener = gzip.open if src.suffix == ".gz" else open
+    count, cards, names = 0, [], []
+    with opener(src, "rt", encoding="utf-8") as fp:
+        for card in iter_json_array(fp):
+            if card.get("object") != "card" or not card.get("id"):
+                continue
+            cards.append((card["id"], card.get("set", "").lower(),
+                          str(card.get("collector_number", "")), json.dumps(slim_card(card))))
+            rank = _name_rank(card)
+            keys = {normalise(card.get("name", ""))}
+            keys.update(normalise(f.get("name", "")) for f in card.get("card_faces", []))
+            names.extend((k, card["id"], rank) for k in keys if k)
+            count += 1
+            if len(cards) >= _BATCH:
+                conn.executemany("INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?)", cards)
+                conn.executemany(upsert_name, names)
+                cards.clear(); names.clear()
+    conn.executemany("INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?)", cards)
+    conn.executemany(upsert_name, names)
+    conn.execute("CREATE INDEX cards_print ON cards(set_code, cn)")
+    conn.commit()
+    conn.close()
+    os.replace(tmp, index_path)
+    return count
+
+
+class BulkIndex:
+    """Read-only lookups against an ingested index; a missing file is a miss."""
+
+    def __init__(self, path: str | Path):
+        self.path     = Path(path)
+        self._local   = threading.local()
+        self._lock    = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def _conn(self) -> sqlite3.Connection | None:
+        local   = self._local
+        now     = time.monotonic()
+        checked = getattr(local, "checked", None)
+        if checked is not None and now - checked < _RECHECK_SECONDS:
+            return local.conn
+        local.checked = now
+        try:
+            st = self.path.stat()
+        except OSError:
+            local.conn = None
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns)
+        if getattr(local, "conn", None) is None or local.stamp != stamp:
+            local.conn  = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                                          check_same_thread=False)
+            local.conn.execute("PRAGMA mmap_size=268435456")
+            local.stamp = stamp
+        return local.conn
+
+    def _one(self, sql: str, args: tuple) -> dict | None:
+        conn = self._conn()
+        row  = None
+        if conn is not None:
+            try:
+                row = conn.execute(sql, args).fetchone()
+            except sqlite3.Error:
+                row = None
+        with self._lock:
+            self._counters["hits" if row else "misses"] += 1
+        return json.loads(row[0]) if row else None
+
+    def by_id(self, scryfall_id: str) -> dict | None:
+        return self._one("SELECT data FROM cards WHERE id = ?", (scryfall_id,))
+
+    def by_print(self, set_code: str, set_num: str) -> dict | None:
+        return self._one("SELECT data FROM cards WHERE set_code = ? AND cn = ?",
+                         (set_code.lower(), str(set_num)))
+
+    def by_name(self, normalised_name: str) -> dict | None:
+        return self._one("SELECT c.data FROM names n JOIN cards c ON c.id = n.id WHERE n.name = ?",
+                         (normalised_name,))
+
+    def version(self) -> tuple | None:
+        """Identity of the index file in use, or None if there is none."""
+        return self._local.stamp if self._conn() is not None else None
+
+    def names(self) -> Iterator[str]:
+        """Every normalised card and face name in the index."""
+        conn = self._conn()
+        if conn is not None:
+            yield from (row[0] for row in conn.execute("SELECT name FROM names"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "available": self._conn() is not None}
+
+
+def default_path() -> Path:
+    """PROXYFORGE_BULK_INDEX, else bulk.sqlite3 in PROXYFORGE_CACHE_DIR; main.py uses it too."""
+    cache_dir = Path(os.environ.get("PROXYFORGE_CACHE_DIR", Path(tempfile.gettempdir()) / "proxyforge"))
+    return Path(os.environ.get("PROXYFORGE_BULK_INDEX", cache_dir / "bulk.sqlite3"))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the offline Scryfall card index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("ingest", help="index a default_cards / all_cards bulk JSON file")
+    p.add_argument("source", help="path to the bulk data .json (or .json.gz)")
+    p.add_argument("--index", help="index file to write (default: PROXYFORGE_BULK_INDEX)")
+    args = parser.parse_args(argv)
+
+    target = args.index or default_path()
+    started = time.monotonic()
+    count = ingest(args.source, target)
+    print(f"Indexed {count} cards into {target} in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
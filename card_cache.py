@@ -0,0 +1,170 @@
+"""
+card_cache.py - ProxyForge persistent Scryfall metadata cache
+
+A small SQLite-backed key/value store shared by every uvicorn worker on the
+host, so popular cards (Sol Ring, Command Tower, basics) are resolved against
+Scryfall once and then served locally:
+
+  - Keys are plain strings built by id_key() / print_key() / name_key():
+      "id:<scryfall id>", "print:<set>:<collector number>", "name:<normalised name>"
+  - Each entry carries its own expiry; failed lookups are stored as negative
+    entries (NULL payload) with a shorter TTL
+  - The table is capped at max_entries; the entries closest to expiry are
+    evicted first, so reads never have to write
+  - Card objects are slimmed to the fields the fetch pipeline uses
+  - Any SQLite error degrades to a cache miss, never to a failed request
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_TTL          = 7 * 24 * 3600   # card metadata rarely changes
+DEFAULT_NEGATIVE_TTL = 3600            # retry unknown cards hourly
+DEFAULT_MAX_ENTRIES  = 50_000
+_EVICT_EVERY         = 256             # puts between size-cap checks
+
+_CARD_FIELDS = ("id", "name", "layout", "set", "collector_number",
+                "image_uris", "card_faces", "image_status", "highres_image")
+_FACE_FIELDS = ("name", "image_uris")
+
+
+def id_key(scryfall_id: str) -> str:
+    return f"id:{scryfall_id.lower()}"
+
+
+def print_key(set_code: str, set_num: str) -> str:
+    return f"print:{set_code.lower()}:{set_num}"
+
+
+def name_key(normalised_name: str) -> str:
+    return f"name:{normalised_name}"
+
+
+def slim_card(card: dict) -> dict:
+    """Drop everything except the fields the fetch pipeline reads."""
+    out = {k: card[k] for k in _CARD_FIELDS if k in card}
+    if "card_faces" in out:
+        out["card_faces"] = [{k: f[k] for k in _FACE_FIELDS if k in f}
+                             for f in out["card_faces"]]
+    return out
+
+
+class CardCache:
+    """Process-safe, multi-worker card metadata cache backed by SQLite."""
+
+    def __init__(self, path: str | Path,
+                 ttl: int = DEFAULT_TTL,
+                 negative_ttl: int = DEFAULT_NEGATIVE_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path         = Path(path)
+        self.ttl          = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries  = max_entries
+        self._local       = threading.local()
+        self._lock        = threading.Lock()
+        self._puts        = 0
+        self._counters    = {"hits": 0, "negative_hits": 0, "misses": 0,
+                             "stores": 0, "evictions": 0, "errors": 0}
+
+    # ── Connection handling ──────────────────────────────────────────────────
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cards ("
+                " key TEXT PRIMARY KEY,"
+                " data TEXT,"
+                " expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cards_expires ON cards(expires)")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    # ── Public API ───────────────────────────────────────────────────────────
+    def get(self, key: str) -> tuple[bool, dict | None]:
+        """
+        Return (hit, card). A hit with card None is a cached negative lookup;
+        expired entries count as misses.
+        """
+        try:
+            row = self._conn().execute(
+                "SELECT data FROM cards WHERE key = ? AND expires > ?",
+                (key, time.time()),
+            ).fetchone()
+        except sqlite3.Error:
+            self._count("errors")
+            row = None
+        if row is None:
+            self._count("misses")
+            return False, None
+        if row[0] is None:
+            self._count("negative_hits")
+            return True, None
+        self._count("hits")
+        return True, json.loads(row[0])
+
+    def put(self, key: str, card: dict | None, ttl: int | None = None, slim: bool = True) -> None:
+        """
+        Store a card object, or None to remember a failed lookup. With
+        slim=False any JSON-serialisable value is stored as given.
+        """
+        if ttl is None:
+            ttl = self.ttl if card is not None else self.negative_ttl
+        if card is not None and slim:
+            card = slim_card(card)
+        data = json.dumps(card) if card is not None else None
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cards (key, data, expires) VALUES (?, ?, ?)",
+                (key, data, time.time() + ttl),
+            )
+        except sqlite3.Error:
+            self._count("errors")
+            return
+        self._count("stores")
+        with self._lock:
+            self._puts += 1
+            due = self._puts % _EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired rows, then the soonest-to-expire rows over the cap."""
+        try:
+            conn = self._conn()
+            removed = conn.execute("DELETE FROM cards WHERE expires <= ?",
+                                   (time.time(),)).rowcount
+            over = conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0] - self.max_entries
+            if over > 0:
+                removed += conn.execute(
+                    "DELETE FROM cards WHERE key IN "
+                    "(SELECT key FROM cards ORDER BY expires LIMIT ?)", (over,)
+                ).rowcount
+        except sqlite3.Error:
+            self._count("errors")
+            return 0
+        self._count("evictions", removed)
+        return removed
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the shared entry count."""
+        with self._lock:
+            out = dict(self._counters)
+        try:
+            out["entries"] = self._conn().execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+        except sqlite3.Error:
+            out["entries"] = None
+        lookups = out["hits"] + out["negative_hits"] + out["misses"]
+        out["hit_rate"] = round((out["hits"] + out["negative_hits"]) / lookups, 4) if lookups else 0.0
+        return out
@@ -0,0 +1,156 @@
+"""
+fuzzy.py - ProxyForge in-process fuzzy card-name matching
+
+Stands in for Scryfall's cards/named?fuzzy= round trip for typos, split and
+adventure names and front-face names cut at " // ":
+
+  - Names are matched in normalise()d form; the candidate list is every card
+    and face name in the offline bulk index (bulk_index.BulkIndex.names),
+    so "Fire", "Ice" and "Fire // Ice" all resolve to the same card
+  - A trigram inverted index narrows the candidates (Dice overlap), then the
+    best few are ranked by Levenshtein similarity
+  - match() returns the matched key and a 0–1 confidence; callers decide
+    what is too low to use and what is worth flagging
+"""
+
+import threading
+from array import array
+from collections import Counter
+from typing import Iterable, NamedTuple
+
+MIN_CONFIDENCE = 0.6    # below this, treat as no match
+LOW_CONFIDENCE = 0.85   # accepted, but flagged in the report
+_MIN_OVERLAP   = 0.3    # share of query trigrams a candidate must have
+_SHORTLIST     = 32     # candidates scored by exact trigram overlap
+_CANDIDATES    = 6      # of those, ranked by edit distance
+
+
+class Match(NamedTuple):
+    key:        str
+    confidence: float
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"$${key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Edit distance via Myers' bit-parallel algorithm (Hyyrö's variant)."""
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return len(b)
+    peq: dict[str, int] = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    m    = len(a)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score
+
+
+class NameMatcher:
+    """Trigram index over a fixed list of normalised names."""
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys: list[str]             = []
+        self._exact: dict[str, int]      = {}
+        self._sizes                      = array("H")
+        self._postings: dict[str, array] = {}
+        for key in keys:
+            if not key or key in self._exact:
+                continue
+            idx = len(self.keys)
+            self.keys.append(key)
+            self._exact[key] = idx
+            grams = _trigrams(key)
+            self._sizes.append(min(len(grams), 0xFFFF))
+            for g in grams:
+                self._postings.setdefault(g, array("I")).append(idx)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def match(self, key: str) -> Match | None:
+        """Best match for a normalised name, or None below MIN_CONFIDENCE."""
+        if not key:
+            return None
+        if key in self._exact:
+            return Match(key, 1.0)
+
+        grams = _trigrams(key)
+        n     = len(grams)
+        # Prefix filter: a candidate sharing at least `need` trigrams must
+        # appear in one of the (n - need + 1) rarest, so the huge postings
+        # of common trigrams ("$$t", "the") are never walked.
+        need    = max(1, int(n * _MIN_OVERLAP))
+        ordered = sorted(grams, key=lambda g: len(self._postings.get(g, ())))
+        counts  = Counter()
+        for g in ordered[:n - need + 1]:
+            posting = self._postings.get(g)
+            if posting is not None:
+                counts.update(posting)
+        if not counts:
+            return None
+
+        # Exact trigram Dice for the most promising, Levenshtein for the best.
+        shortlist = [idx for idx, _ in counts.most_common(_SHORTLIST)]
+        dice = sorted(((2 * len(grams & _trigrams(self.keys[idx])) / (n + self._sizes[idx]), idx)
+                       for idx in shortlist), reverse=True)[:_CANDIDATES]
+        best = None
+        for _, idx in dice:
+            cand = self.keys[idx]
+            longest = max(len(key), len(cand))
+            if best is not None and 1 - abs(len(key) - len(cand)) / longest <= best.confidence:
+                continue
+            sim = 1 - levenshtein(key, cand) / longest
+            if best is None or sim > best.confidence:
+                best = Match(cand, round(sim, 4))
+        return best if best and best.confidence >= MIN_CONFIDENCE else None
+
+
+class IndexedNameMatcher:
+    """
+    NameMatcher over a BulkIndex's names, built on first use and rebuilt when
+    a new snapshot is ingested. match() returns None while no index exists.
+    """
+
+    def __init__(self, bulk_index):
+        self.bulk     = bulk_index
+        self._matcher: NameMatcher | None = None
+        self._version = None
+        self._lock    = threading.Lock()
+
+    def _current(self) -> NameMatcher | None:
+        version = self.bulk.version()
+        if version is None:
+            return None
+        with self._lock:
+            if self._matcher is None or self._version != version:
+                self._matcher = NameMatcher(self.bulk.names())
+                self._version = version
+            return self._matcher
+
+    def warm(self) -> None:
+        """Build the matcher now instead of on the first name lookup."""
+        self._current()
+
+    def match(self, key: str) -> Match | None:
+        matcher = self._current()
+        return matcher.match(key) if matcher else None
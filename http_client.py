@@ -0,0 +1,295 @@
+"""
+http_client.py - ProxyForge pooled HTTP client
+
+One shared client for every outbound request (deck sites, api.scryfall.com,
+cards.scryfall.io), replacing a fresh urllib connection per call:
+
+  - Keep-alive connections are pooled per (scheme, host, port), so a deck's
+    lookups and image downloads reuse a handful of TCP+TLS sessions; each
+    host gets at most `per_host` connections at once
+  - 429, 5xx and network errors are retried with jittered exponential
+    backoff; a Retry-After header overrides the computed delay and, when a
+    TokenBucket is passed in, pauses every other caller of that bucket too
+  - Failures surface as distinct exceptions so callers can tell "this card
+    does not exist" (NotFound) from "try again later" (TransientError); a
+    corrupt gzip body or a 2xx that is not the JSON asked for (a proxy's
+    HTML error page) counts as the latter
+  - Redirects are followed, gzip responses decoded, and the usual
+    http(s)_proxy / no_proxy environment variables honoured
+
+Connections are HTTP/1.1: the standard library has no HTTP/2 client.
+"""
+
+import email.utils
+import gzip
+import http.client
+import json
+import random
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+import zlib
+from typing import NamedTuple
+
+DEFAULT_TIMEOUT    = 15
+DEFAULT_PER_HOST   = 8
+DEFAULT_RETRIES    = 3
+_BACKOFF_BASE      = 0.5     # seconds; doubled per attempt, then jittered
+_BACKOFF_CAP       = 30.0    # longest wait between attempts, Retry-After included
+_MAX_REDIRECTS     = 5
+_IDLE_SECONDS      = 30      # drop pooled connections idle longer than this
+_TRANSIENT_STATUS  = {408, 425, 429, 500, 502, 503, 504}
+_REDIRECT_STATUS   = {301, 302, 303, 307, 308}
+
+
+class HttpError(Exception):
+    """A request that did not produce a 2xx response."""
+
+    def __init__(self, url: str, status: int | None = None, reason: str = ""):
+        self.url    = url
+        self.status = status
+        self.reason = reason
+        host = urllib.parse.urlsplit(url).hostname or url
+        what = f"HTTP {status}" if status else reason or "request failed"
+        super().__init__(f"{what} from {host}")
+
+
+class NotFound(HttpError):
+    """404 / 410: the resource definitively does not exist."""
+
+
+class TransientError(HttpError):
+    """Rate limiting, server errors or network trouble that outlasted every retry."""
+
+
+class Response(NamedTuple):
+    status:  int
+    headers: dict[str, str]
+    body:    bytes
+    url:     str = ""
+
+    def json(self):
+        """The decoded body; TransientError if it is not JSON."""
+        try:
+            return json.loads(self.body)
+        except ValueError as e:
+            raise TransientError(self.url, reason="invalid JSON response") from e
+
+
+def retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class _HostPool:
+    """Idle connections to one origin plus a cap on how many may be open."""
+
+    def __init__(self, per_host: int):
+        self.slots = threading.BoundedSemaphore(per_host)
+        self.idle: list[tuple[float, http.client.HTTPConnection]] = []
+        self.lock  = threading.Lock()
+
+
+class HttpClient:
+    """Thread-safe pooled HTTP/1.1 client; share one instance per process."""
+
+    def __init__(self, per_host: int = DEFAULT_PER_HOST, retries: int = DEFAULT_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.per_host  = max(1, per_host)
+        self.retries   = max(0, retries)
+        self.timeout   = timeout
+        self._pools: dict[tuple, _HostPool] = {}
+        self._lock     = threading.Lock()
+        self._ssl      = ssl.create_default_context()
+        self._proxies  = urllib.request.getproxies()
+        self._counters = {"requests": 0, "connections": 0, "reused": 0,
+                          "retries": 0, "rate_limited": 0, "failures": 0}
+
+    # ── Connections ──────────────────────────────────────────────────────────
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def _pool(self, origin: tuple) -> _HostPool:
+        with self._lock:
+            pool = self._pools.get(origin)
+            if pool is None:
+                pool = self._pools[origin] = _HostPool(self.per_host)
+            return pool
+
+    def _connect(self, scheme: str, host: str, port: int, timeout: float) -> http.client.HTTPConnection:
+        proxy = self._proxies.get(scheme)
+        if proxy and urllib.request.proxy_bypass(host):
+            proxy = None
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        kwargs = {"context": self._ssl} if scheme == "https" else {}
+        if proxy:
+            p    = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+            conn = cls(p.hostname, p.port or 8080, timeout=timeout, **kwargs)
+            conn.set_tunnel(host, port)
+        else:
+            conn = cls(host, port, timeout=timeout, **kwargs)
+        self._count("connections")
+        return conn
+
+    def _checkout(self, pool: _HostPool) -> http.client.HTTPConnection | None:
+        now = time.monotonic()
+        with pool.lock:
+            while pool.idle:
+                stamp, conn = pool.idle.pop()
+                if now - stamp < _IDLE_SECONDS:
+                    return conn
+                conn.close()
+        return None
+
+    def _checkin(self, pool: _HostPool, conn: http.client.HTTPConnection) -> None:
+        with pool.lock:
+            pool.idle.append((time.monotonic(), conn))
+
+    def _send(self, method: str, url: str, body: bytes | None, headers: dict,
+              timeout: float) -> Response:
+        """One HTTP exchange over a pooled connection; no retries, no redirects."""
+        parts  = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise HttpError(url, reason=f"unsupported URL {url!r}")
+        port   = parts.port or (443 if scheme == "https" else 80)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        pool = self._pool((scheme, parts.hostname, port))
+
+        with pool.slots:
+            conn = self._checkout(pool)
+            # A pooled connection the server has since closed fails on first
+            # use; that is retried at once on a fresh connection.
+            for reused in ((True, False) if conn is not None else (False,)):
+                if not reused:
+                    conn = self._connect(scheme, parts.hostname, port, timeout)
+                try:
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    conn.request(method, target, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    data = resp.read()
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    if reused and isinstance(e, (ConnectionResetError, BrokenPipeError,
+                                                 http.client.RemoteDisconnected)):
+                        continue
+                    reason = "timed out" if isinstance(e, socket.timeout) else type(e).__name__
+                    raise TransientError(url, reason=reason) from e
+                except BaseException:
+                    conn.close()
+                    raise
+                if reused:
+                    self._count("reused")
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._checkin(pool, conn)
+                break
+
+        if resp.getheader("Content-Encoding", "").lower() == "gzip":
+            try:
+                data = gzip.decompress(data)
+            except (OSError, EOFError, zlib.error) as e:
+                raise TransientError(url, reason="corrupt gzip body") from e
+        return Response(resp.status, {k.lower(): v for k, v in resp.getheaders()}, data, url)
+
+    # ── Public API ───────────────────────────────────────────────────────────
+    def request(self, method: str, url: str, body: bytes | None = None,
+                headers: dict | None = None, timeout: float | None = None,
+                limiter=None) -> Response:
+        """
+        Perform a request, following redirects and retrying transient failures.
+        `limiter` (a main.TokenBucket) is waited on before every attempt.
+        Returns the 2xx Response (or a 304 answering a conditional request),
+        otherwise raises NotFound / TransientError / HttpError.
+        """
+        headers = dict(headers or {})
+        timeout = timeout or self.timeout
+        self._count("requests")
+        attempt = redirects = 0
+        while True:
+            if limiter is not None:
+                limiter.wait()
+            delay = None
+            try:
+                resp = self._send(method, url, body, headers, timeout)
+            except TransientError:
+                if attempt >= self.retries:
+                    self._count("failures")
+                    raise
+            else:
+                if resp.status in _REDIRECT_STATUS and resp.headers.get("location") \
+                        and redirects < _MAX_REDIRECTS:
+                    url = urllib.parse.urljoin(url, resp.headers["location"])
+                    if resp.status == 303:
+                        method, body = "GET", None
+                    redirects += 1
+                    continue
+                if 200 <= resp.status < 300 or resp.status == 304:
+                    return resp
+                if resp.status not in _TRANSIENT_STATUS:
+                    self._count("failures")
+                    raise (NotFound if resp.status in (404, 410) else HttpError)(url, resp.status)
+                if attempt >= self.retries:
+                    self._count("failures")
+                    raise TransientError(url, resp.status)
+                delay = retry_after(resp.headers.get("retry-after"))
+                if resp.status == 429:
+                    self._count("rate_limited")
+                    if limiter is not None:
+                        # Hold back every caller sharing the bucket; this
+                        # attempt then waits its turn in limiter.wait().
+                        limiter.pause(min(delay if delay is not None
+                                          else _BACKOFF_BASE * 2 ** attempt, _BACKOFF_CAP))
+                        delay = 0.0
+
+            if delay is None:
+                delay = _BACKOFF_BASE * 2 ** attempt * random.uniform(0.5, 1.0)
+            self._count("retries")
+            if delay:
+                time.sleep(min(delay, _BACKOFF_CAP))
+            attempt += 1
+
+    def get(self, url: str, headers: dict | None = None, **kwargs) -> bytes:
+        return self.request("GET", url, headers=headers, **kwargs).body
+
+    def get_json(self, url: str, headers: dict | None = None, **kwargs):
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip", **(headers or {})}
+        return self.request("GET", url, headers=headers, **kwargs).json()
+
+    def post_json(self, url: str, payload, headers: dict | None = None, **kwargs):
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip",
+                   "Content-Type": "application/json", **(headers or {})}
+        return self.request("POST", url, body=json.dumps(payload).encode(),
+                            headers=headers, **kwargs).json()
+
+    def close(self) -> None:
+        """Close every idle pooled connection."""
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            with pool.lock:
+                for _, conn in pool.idle:
+                    conn.close()
+                pool.idle.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
@@ -0,0 +1,180 @@
+"""
+image_store.py - ProxyForge on-disk card image store
+
+Keeps downloaded card images on local disk so every worker process on the
+host can reuse them instead of pulling the same 1–2 MB PNG from
+cards.scryfall.io again:
+
+  - Content-addressed: image bytes live under blobs/<aa>/<sha256 of bytes>
+  - Lookup is by image URL; Scryfall URLs end in "?<image version>", so a
+    re-scanned image gets a new URL and therefore a new ref. refs/<aa>/<sha256
+    of URL> holds the content hash of the blob it points to
+  - Every file is written to a temp name and os.replace()d into place, so
+    concurrent writers and readers only ever see complete files
+  - Reads bump the blob's mtime; eviction removes the least recently used
+    blobs until the store is back under its byte budget
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+_EVICT_SLACK      = 0.9     # evict down to 90% of the budget
+_TOUCH_INTERVAL   = 60      # seconds between mtime bumps for the same blob
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ImageStore:
+    """Bounded, LRU-evicted, multi-process image cache keyed by URL."""
+
+    def __init__(self, root: str | Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root      = Path(root)
+        self.max_bytes = max_bytes
+        self._lock     = threading.Lock()
+        self._written  = 0
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                          "bytes_served": 0, "bytes_stored": 0, "errors": 0}
+
+    # ── Paths ────────────────────────────────────────────────────────────────
+    def _ref_path(self, url: str) -> Path:
+        k = url_key(url)
+        return self.root / "refs" / k[:2] / k
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / digest
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _locate(self, url: str) -> tuple[Path, int] | None:
+        """(blob path, size) for `url` if it is stored, bumping its LRU age."""
+        try:
+            digest = self._ref_path(url).read_text().strip()
+            blob   = self._blob_path(digest)
+            st     = blob.stat()
+        except (OSError, ValueError):
+            return None
+        if time.time() - st.st_mtime > _TOUCH_INTERVAL:
+            try:
+                os.utime(blob)
+            except OSError:
+                pass
+        return blob, st.st_size
+
+    # ── Public API ───────────────────────────────────────────────────────────
+    def path(self, url: str) -> Path | None:
+        """Return the blob path for `url` if it is stored, bumping its LRU age."""
+        found = self._locate(url)
+        return found[0] if found else None
+
+    def get(self, url: str) -> bytes | None:
+        """Return the stored bytes for `url`, or None on a miss."""
+        blob = self.path(url)
+        if blob is not None:
+            try:
+                data = blob.read_bytes()
+            except OSError:
+                data = None
+            if data is not None:
+                self._count("hits")
+                self._count("bytes_served", len(data))
+                return data
+        self._count("misses")
+        return None
+
+    def get_path(self, url: str) -> Path | None:
+        """Like get(), but hand back the blob path instead of reading it."""
+        found = self._locate(url)
+        if found is None:
+            self._count("misses")
+            return None
+        blob, size = found
+        self._count("hits")
+        self._count("bytes_served", size)
+        return blob
+
+    def put(self, url: str, data: bytes) -> str:
+        """Store `data` as the image for `url` and return its content hash."""
+        digest = content_hash(data)
+        try:
+            blob = self._blob_path(digest)
+            if not blob.exists():
+                self._atomic_write(blob, data)
+            self._atomic_write(self._ref_path(url), digest.encode())
+        except OSError:
+            self._count("errors")
+            return digest
+        self._count("stores")
+        self._count("bytes_stored", len(data))
+        with self._lock:
+            self._written += len(data)
+            due = self._written >= self.max_bytes * (1 - _EVICT_SLACK)
+            if due:
+                self._written = 0
+        if due:
+            self.evict()
+        return digest
+
+    def evict(self) -> int:
+        """Remove least recently used blobs until under the byte budget."""
+        blobs, total = [], 0
+        for p in (self.root / "blobs").glob("*/*"):
+            if p.name.startswith(".tmp-"):
+                continue
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            blobs.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        target, removed = self.max_bytes * _EVICT_SLACK, 0
+        for _, size, p in sorted(blobs, key=lambda b: b[0]):
+            if total <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total   -= size
+            removed += 1
+        # Refs to evicted blobs are left behind; path() treats them as misses
+        # and the next put() overwrites them.
+        self._count("evictions", removed)
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._counters)
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+        return out
@@ -0,0 +1,173 @@
+"""
+jobs.py - ProxyForge background job manager
+
+Runs long print jobs (deck resolution, downloads, rendering) outside the
+HTTP request that submitted them:
+
+  - A bounded asyncio.Queue feeds a fixed number of worker tasks, so a burst
+    of large decks queues up instead of tying up request workers; a full
+    queue is reported immediately as JobQueueFull
+  - Each job keeps an append-only event log (per-card report entries, render
+    progress, completion). Subscribers replay it from the start and then
+    follow live, which is what the Server-Sent Events endpoint streams;
+    `done` or `failed` is always the last event
+  - Finished artifacts are written to a temp file and renamed into place,
+    then deleted together with the job record once `ttl` seconds pass
+  - Each job records its own stage timings (see metrics.py), reported by
+    describe() and fed to the job duration histogram
+
+Jobs live in the memory of the process that accepted them; with several
+uvicorn workers, route a job's follow-up requests to the same worker.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+
+from metrics import METRICS, Timings, track
+
+KEEPALIVE_SECONDS = 15
+
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit when no more jobs can be queued."""
+
+
+class Job:
+    """One queued or running print job and its event log."""
+
+    def __init__(self, kind: str, path: Path, media_type: str, filename: str):
+        self.id         = uuid.uuid4().hex
+        self.kind       = kind
+        self.path       = path
+        self.media_type = media_type
+        self.filename   = filename
+        self.status     = "queued"
+        self.summary: dict | None = None
+        self.report:  list | None = None
+        self.error:   str | None  = None
+        self.created    = time.time()
+        self.finished: float | None = None
+        self.timings    = Timings()
+        self.events: list[tuple[str, dict]] = []
+        self._loop      = asyncio.get_running_loop()
+        self._wake      = asyncio.Event()
+
+    def emit(self, name: str, data: dict) -> None:
+        """Append an event and wake every subscriber. Event-loop thread only."""
+        self.events.append((name, data))
+        wake, self._wake = self._wake, asyncio.Event()
+        wake.set()
+
+    def emit_threadsafe(self, name: str, data: dict) -> None:
+        """emit() from a worker thread (e.g. a PDF render callback)."""
+        self._loop.call_soon_threadsafe(self.emit, name, data)
+
+    async def follow(self) -> AsyncIterator[tuple[str, dict] | None]:
+        """
+        Yield every event from the start, then new ones as they arrive, until
+        the job finishes. Yields None every KEEPALIVE_SECONDS of silence.
+        """
+        i = 0
+        while True:
+            wake = self._wake
+            while i < len(self.events):
+                yield self.events[i]
+                i += 1
+            if self.finished is not None:
+                return
+            try:
+                await asyncio.wait_for(wake.wait(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+
+    def describe(self) -> dict:
+        return {"id": self.id, "kind": self.kind, "status": self.status,
+                "summary": self.summary, "report": self.report, "error": self.error,
+                "timings": self.timings.as_dict()}
+
+
+class JobManager:
+    """Bounded worker pool and queue for Job runners."""
+
+    def __init__(self, root: str | Path, workers: int = 2,
+                 max_queue: int = 16, ttl: int = 900):
+        self.root      = Path(root)
+        self.workers   = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.ttl       = ttl
+        self.jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task]   = []
+
+    def _start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, kind: str, suffix: str, media_type: str, filename: str,
+               runner: Callable[[Job, Path], Awaitable[None]]) -> Job:
+        """
+        Queue `runner(job, tmp_path)`, which must write the artifact to
+        tmp_path and may set job.summary / job.report and emit events.
+        """
+        self._start()
+        self.expire()
+        self.root.mkdir(parents=True, exist_ok=True)
+        job = Job(kind, self.root / f"{uuid.uuid4().hex}{suffix}", media_type, filename)
+        try:
+            self._queue.put_nowait((job, runner))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Job queue is full ({self.max_queue} waiting); try again shortly.")
+        self.jobs[job.id] = job
+        job.emit("status", {"status": "queued", "position": self._queue.qsize()})
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        self.expire()
+        return self.jobs.get(job_id)
+
+    def expire(self) -> None:
+        """Forget finished jobs older than ttl and delete their artifacts."""
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self.jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                del self.jobs[job_id]
+                try:
+                    job.path.unlink()
+                except OSError:
+                    pass
+
+    async def _worker(self) -> None:
+        while True:
+            job, runner = await self._queue.get()
+            tmp = job.path.with_name(job.path.name + ".part")
+            job.status  = "running"
+            job.timings = Timings()   # run time only, not time spent queued
+            job.emit("status", {"status": "running"})
+            outcome = None
+            try:
+                with track(job.timings):
+                    await runner(job, tmp)
+                os.replace(tmp, job.path)
+                job.status = "done"
+                outcome = ("done", job.summary or {})
+            except Exception as e:
+                job.status = "failed"
+                job.error  = str(getattr(e, "detail", None) or e)
+                outcome = ("failed", {"detail": job.error})
+            finally:
+                job.finished = time.time()
+                job.timings.stop()
+                METRICS.observe_job(job.kind, job.status, job.timings.elapsed())
+                try:
+                    tmp.unlink()
+                except OSError:
+                    pass
+                # The terminal event is the last one: it is emitted once the
+                # job is finished, so followers stop right after it.
+                job.emit(*(outcome or ("status", {"status": job.status})))
+                self._queue.task_done()
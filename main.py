@@ -1,70 +1,192 @@
 import asyncio
+import base64
 import io
 import json
+import os
 import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
 import urllib.parse
-import urllib.request
 import zipfile
 from pathlib import Path
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, Header, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, Response, StreamingResponse
+
+from bulk_index import BulkIndex
+from bulk_index import default_path as bulk_index_path
+from card_cache import CardCache, id_key, name_key, print_key
+from fuzzy import LOW_CONFIDENCE, IndexedNameMatcher
+from http_client import HttpClient, HttpError, NotFound, TransientError
+from image_store import ImageStore, content_hash
+from jobs import JobManager, JobQueueFull
+from metrics import METRICS, TimingMiddleware, stage, stats_samples
+from names import normalise
+from result_cache import ResultCache
+from result_cache import digest as result_digest
+from singleflight import SingleFlight
+from static_page import StaticPage
 
 app = FastAPI(title="ProxyForge")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+# Per-stage timings in a Server-Timing header; aggregated at /metrics.
+app.add_middleware(TimingMiddleware)
 
 FLIP_LAYOUTS = {"transform", "modal_dfc", "flip", "reversible_card", "battle", "meld"}
 SCRYFALL_HEADERS = {"User-Agent": "ProxyForge/2.0", "Accept": "application/json"}
 
-# ── URL → deck list fetchers ───────────────────────────────────────────────────
+# Point this at a stand-in (bench/scryfall_stub.py) to run without the real API.
+SCRYFALL_API = os.environ.get("PROXYFORGE_SCRYFALL_API", "https://api.scryfall.com").rstrip("/")
+
+# Scryfall asks for 50–100 ms between API requests (~10/s); cards.scryfall.io
+# image downloads are not rate limited, only bounded by FETCH_CONCURRENCY.
+SCRYFALL_RATE      = float(os.environ.get("PROXYFORGE_SCRYFALL_RATE", "10"))
+SCRYFALL_BURST     = int(os.environ.get("PROXYFORGE_SCRYFALL_BURST", "5"))
+FETCH_CONCURRENCY  = int(os.environ.get("PROXYFORGE_FETCH_CONCURRENCY", "8"))
+SCRYFALL_COLLECTION_MAX = 75   # identifiers per POST /cards/collection
+
+# Scryfall serves each card image in fixed sizes; width in px per tier. A card
+# is 63 mm wide, so e.g. "large" holds ~271 PPI and "normal" ~197 PPI.
+IMAGE_TIERS    = {"png": 745, "large": 672, "normal": 488, "small": 146}
+CARD_WIDTH_IN  = 63 / 25.4
+IMAGE_POLICY   = os.environ.get("PROXYFORGE_IMAGE_POLICY", "auto")
+# Sheets are resampled to the card slot and JPEG-encoded, so a source up to
+# 10% under the target PPI prints indistinguishably. ZIP downloads hand the
+# files over as-is and get no slack.
+IMAGE_PPI_SLACK = 0.9
+
+# Shared on-disk caches; every uvicorn worker on the host points at the same dir.
+CACHE_DIR = Path(os.environ.get("PROXYFORGE_CACHE_DIR", Path(tempfile.gettempdir()) / "proxyforge"))
+CARD_CACHE = CardCache(
+    CACHE_DIR / "cards.sqlite3",
+    ttl=int(os.environ.get("PROXYFORGE_CARD_TTL", 7 * 24 * 3600)),
+    negative_ttl=int(os.environ.get("PROXYFORGE_CARD_NEGATIVE_TTL", 3600)),
+    max_entries=int(os.environ.get("PROXYFORGE_CARD_CACHE_MAX", 50_000)),
+)
+# Deck-site payloads are reused as-is for DECK_FRESH_TTL seconds, then
+# revalidated with a conditional request for up to DECK_KEEP_TTL.
+DECK_FRESH_TTL = int(os.environ.get("PROXYFORGE_DECK_TTL", 300))
+DECK_KEEP_TTL  = 24 * 3600
+# Optional offline index built with `python bulk_index.py ingest <bulk file>`.
+BULK_INDEX = BulkIndex(bulk_index_path())
+NAME_MATCHER = IndexedNameMatcher(BULK_INDEX)
+IMAGE_STORE = ImageStore(
+    CACHE_DIR / "images",
+    max_bytes=int(os.environ.get("PROXYFORGE_IMAGE_CACHE_MB", 2048)) * 1024 ** 2,
+)
+# Finished PDFs / ZIPs, served again for identical requests; 0 MB disables it.
+RESULT_CACHE = ResultCache(
+    CACHE_DIR / "results",
+    max_bytes=int(os.environ.get("PROXYFORGE_RESULT_CACHE_MB", 1024)) * 1024 ** 2,
+)
+# Pooled keep-alive connections for every outbound request.
+HTTP = HttpClient(
+    per_host=int(os.environ.get("PROXYFORGE_HTTP_CONNECTIONS", FETCH_CONCURRENCY)),
+    retries=int(os.environ.get("PROXYFORGE_HTTP_RETRIES", 3)),
+)
+# Concurrent requests for the same card share one Scryfall call / download.
+LOOKUP_FLIGHTS   = SingleFlight()
+DOWNLOAD_FLIGHTS = SingleFlight()
+BATCH_MAX_DECKS = int(os.environ.get("PROXYFORGE_BATCH_MAX_DECKS", 64))
+JOBS = JobManager(
+    CACHE_DIR / "jobs",
+    workers=int(os.environ.get("PROXYFORGE_JOB_WORKERS", 2)),
+    max_queue=int(os.environ.get("PROXYFORGE_JOB_QUEUE", 16)),
+    ttl=int(os.environ.get("PROXYFORGE_JOB_TTL", 900)),
+)
 
-def _http_get_json(url: str, headers: dict = None) -> dict:
-    h = {"User-Agent": "ProxyForge/2.0", "Accept": "application/json"}
-    if headers:
-        h.update(headers)
-    req = urllib.request.Request(url, headers=h)
-    with urllib.request.urlopen(req, timeout=15) as r:
-        return json.loads(r.read())
+# ── URL → deck list fetchers ───────────────────────────────────────────────────
 
-def fetch_archidekt(url: str) -> str:
+def _cached_deck(key: str, url: str, extract, headers: dict = None) -> list:
     """
-    Archidekt deck URL: https://archidekt.com/decks/1234567/deckname
-    API:                https://archidekt.com/api/decks/1234567/
-    Returns plain deck list text.
+    Fetch a deck-site API payload and return extract(payload), memoised in
+    CARD_CACHE. Within DECK_FRESH_TTL the cached entries are returned without
+    a request; after that the payload is revalidated with If-None-Match /
+    If-Modified-Since, and a 304 reuses the cached entries.
     """
-    m = re.search(r'archidekt\.com/decks/(\d+)', url)
-    if not m:
-        raise ValueError("Could not extract Archidekt deck ID from URL")
-    deck_id = m.group(1)
-    api_url = f"https://archidekt.com/api/decks/{deck_id}/"
-    data = _http_get_json(api_url)
+    _, cached = CARD_CACHE.get(key)
+    if cached and time.time() - cached["fetched"] < DECK_FRESH_TTL:
+        return cached["entries"]
+    h = {**SCRYFALL_HEADERS, "Accept-Encoding": "gzip", **(headers or {})}
+    if cached and cached.get("etag"):
+        h["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        h["If-Modified-Since"] = cached["last_modified"]
+    resp = HTTP.request("GET", url, headers=h)
+    if resp.status == 304 and cached:
+        entries = cached["entries"]
+    else:
+        entries = extract(resp.json())
+    CARD_CACHE.put(key, {
+        "fetched":       time.time(),
+        "etag":          resp.headers.get("etag") or (cached or {}).get("etag"),
+        "last_modified": resp.headers.get("last-modified") or (cached or {}).get("last_modified"),
+        "entries":       entries,
+    }, ttl=DECK_KEEP_TTL, slim=False)
+    return entries
 
-    lines = []
+def _deck_entry(qty, name, set_code, cn, scryfall_id):
+    return {"qty": qty, "name": name, "set_code": (set_code or "").lower() or None,
+            "set_num": str(cn) if cn else None, "scryfall_id": scryfall_id or None}
+
+def _archidekt_entries(data: dict) -> list:
+    entries = []
     for card_entry in data.get("cards", []):
         qty      = card_entry.get("quantity", 1)
         card     = card_entry.get("card", {})
         name     = card.get("oracleCard", {}).get("name", "") or card.get("name", "")
-        edition  = card_entry.get("edition", {})
+        edition  = card_entry.get("edition") or card.get("edition", {})
         set_code = edition.get("editioncode", "") if isinstance(edition, dict) else ""
-        cn       = card_entry.get("collectorNumber", "")
+        cn       = card_entry.get("collectorNumber", "") or card.get("collectorNumber", "")
         # Skip sideboard / maybeboard categories
-        cats = card_entry.get("categories", [])
+        cats = card_entry.get("categories") or []
         if any(c.lower() in ("sideboard", "maybeboard", "maybe") for c in cats):
             continue
         if not name:
             continue
-        if set_code and cn:
-            lines.append(f"{qty}x {name} ({set_code}) {cn}")
-        else:
-            lines.append(f"{qty}x {name}")
-    return "\n".join(lines)
+        # Archidekt's card "uid" is the printing's Scryfall id.
+        entries.append(_deck_entry(qty, name, set_code, cn, card.get("uid")))
+    return entries
 
-def fetch_moxfield(url: str) -> str:
+def fetch_archidekt(url: str) -> list:
+    """
+    Archidekt deck URL: https://archidekt.com/decks/1234567/deckname
+    API:                https://archidekt.com/api/decks/1234567/
+    Returns structured deck entries (see format_deck_list).
+    """
+    m = re.search(r'archidekt\.com/decks/(\d+)', url)
+    if not m:
+        raise ValueError("Could not extract Archidekt deck ID from URL")
+    deck_id = m.group(1)
+    api_url = f"https://archidekt.com/api/decks/{deck_id}/"
+    return _cached_deck(f"deck:archidekt:{deck_id}", api_url, _archidekt_entries)
+
+def _moxfield_entries(data: dict) -> list:
+    entries = []
+    # Moxfield groups cards by zone: mainboard, commanders, etc.
+    for zone_name, zone in data.get("boards", {}).items():
+        if zone_name.lower() in ("sideboard", "maybeboard"):
+            continue
+        for card_id, entry in zone.get("cards", {}).items():
+            qty  = entry.get("quantity", 1)
+            card = entry.get("card", {})
+            name = card.get("name", "")
+            set_code = card.get("set", "")
+            cn   = card.get("cn", "") or card.get("collectorNumber", "")
+            if not name:
+                continue
+            entries.append(_deck_entry(qty, name, set_code, cn, card.get("scryfall_id")))
+    return entries
+
+def fetch_moxfield(url: str) -> list:
     """
     Moxfield deck URL: https://www.moxfield.com/decks/aBcDeFgH
     API:               https://api2.moxfield.com/v3/decks/all/aBcDeFgH
-    Returns plain deck list text.
+    Returns structured deck entries (see format_deck_list).
     """
     m = re.search(r'moxfield\.com/decks/([A-Za-z0-9_-]+)', url)
     if not m:
@@ -80,29 +202,10 @@ def fetch_moxfield(url: str) -> str:
         ),
         "Referer": "https://www.moxfield.com/",
     }
-    data = _http_get_json(api_url, headers=headers)
-
-    lines = []
-    # Moxfield groups cards by zone: mainboard, commanders, etc.
-    for zone_name, zone in data.get("boards", {}).items():
-        if zone_name.lower() in ("sideboard", "maybeboard"):
-            continue
-        for card_id, entry in zone.get("cards", {}).items():
-            qty  = entry.get("quantity", 1)
-            card = entry.get("card", {})
-            name = card.get("name", "")
-            set_code = card.get("set", "")
-            cn   = card.get("cn", "") or card.get("collectorNumber", "")
-            if not name:
-                continue
-            if set_code and cn:
-                lines.append(f"{qty}x {name} ({set_code}) {cn}")
-            else:
-                lines.append(f"{qty}x {name}")
-    return "\n".join(lines)
+    return _cached_deck(f"deck:moxfield:{public_id}", api_url, _moxfield_entries, headers=headers)
 
-def fetch_deck_from_url(url: str) -> str:
-    """Detect site and fetch deck list text from a URL."""
+def fetch_deck_entries(url: str) -> list:
+    """Detect site and fetch structured deck entries from a URL."""
     url = url.strip()
     if "archidekt.com" in url:
         return fetch_archidekt(url)
@@ -111,21 +214,80 @@ def fetch_deck_from_url(url: str) -> str:
     else:
         raise ValueError(f"Unsupported deck URL. Supported: archidekt.com, moxfield.com")
 
+def format_deck_list(entries: list) -> str:
+    """
+    Deck list text for structured entries. Pinned printings keep their
+    Scryfall id as a trailing "[scryfall:<id>]" tag, which parse_deck_list
+    reads back so the card is resolved by id.
+    """
+    lines = []
+    for e in entries:
+        line = f"{e['qty']}x {e['name']}"
+        if e.get("set_code") and e.get("set_num"):
+            line += f" ({e['set_code']}) {e['set_num']}"
+        if e.get("scryfall_id"):
+            line += f" [scryfall:{e['scryfall_id']}]"
+        lines.append(line)
+    return "\n".join(lines)
+
+def fetch_deck_from_url(url: str) -> str:
+    """Detect site and fetch deck list text from a URL."""
+    return format_deck_list(fetch_deck_entries(url))
+
+
+# ── Rate limiting ──────────────────────────────────────────────────────────────
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every request in the process.
+    Callers reserve a token up front and sleep off any deficit, so concurrent
+    waiters are spaced out at `rate` per second after the initial `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate     = rate
+        self.capacity = max(1, burst)
+        self._tokens  = float(self.capacity)
+        self._stamp   = time.monotonic()
+        self._lock    = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp  = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def wait(self) -> None:
+        """Block the calling (worker) thread until a token is available."""
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds` (e.g. after a 429 Retry-After)."""
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+SCRYFALL_LIMITER = TokenBucket(SCRYFALL_RATE, SCRYFALL_BURST)
+
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
 def safe_filename(name):
     return re.sub(r'[<>:"/\\|?*]', '_', name)
 
-def normalise(name):
-    return re.sub(r'[^a-z0-9]', '', name.lower())
-
 def parse_deck_list(text):
     cards = []
     for line in text.splitlines():
         line = line.strip()
         if not line or line.startswith("//") or line.startswith("#"):
             continue
+        scryfall_id = None
+        m = re.search(r'\s*\[scryfall:([0-9a-fA-F-]{36})\]\s*$', line)
+        if m:
+            scryfall_id, line = m.group(1).lower(), line[:m.start()]
         line = re.sub(r'\s*\[[^\]]*\]\s*$', '', line).strip()
         if not line:
             continue
@@ -140,45 +302,374 @@ def parse_deck_list(text):
             name, set_code, set_num = m2.group(1).strip(), m2.group(2).lower(), m2.group(3)
         if ' // ' in name:
             name = name.split(' // ')[0].strip()
-        cards.append({"qty": qty, "name": name, "set_code": set_code, "set_num": set_num})
+        cards.append({"qty": qty, "name": name, "set_code": set_code, "set_num": set_num,
+                      "scryfall_id": scryfall_id})
     return cards
 
-def scryfall_get(set_code, set_num, name):
-    try:
-        if set_code and set_num:
-            url = f"https://api.scryfall.com/cards/{set_code}/{set_num}"
+def _scryfall_fetch(url):
+    with stage("scryfall"):
+        return HTTP.get_json(url, headers=SCRYFALL_HEADERS, timeout=10, limiter=SCRYFALL_LIMITER)
+
+def _fetch_card(cache_key, url):
+    """
+    Fetch and cache the card behind CARD_CACHE key `cache_key`, sharing one
+    call between concurrent callers. Returns None for a 404, which is cached
+    as negative; other HttpErrors propagate.
+    """
+    def fetch():
+        try:
+            card = _scryfall_fetch(url)
+        except NotFound:
+            CARD_CACHE.put(cache_key, None)
+            return None
+        CARD_CACHE.put(cache_key, card)
+        return card
+    return LOOKUP_FLIGHTS.do(cache_key, fetch)
+
+def scryfall_get(set_code, set_num, name, scryfall_id=None):
+    """
+    Blocking Scryfall lookup; run it off the event loop via asyncio.to_thread.
+    Tries the Scryfall id, then the printing, then the name, consulting
+    BULK_INDEX and then CARD_CACHE before each network call.
+    Returns None for a card Scryfall does not know; only those 404s are cached
+    as negative. Raises TransientError when Scryfall stayed unavailable
+    through every retry, so the failure is reported as such and not cached.
+    """
+    if scryfall_id:
+        card = BULK_INDEX.by_id(scryfall_id)
+        if card is not None:
+            return card
+        ikey = id_key(scryfall_id)
+        hit, card = CARD_CACHE.get(ikey)
+        if card is not None:
+            return card
+        if not hit:
+            try:
+                card = _fetch_card(ikey, f"{SCRYFALL_API}/cards/{urllib.parse.quote(scryfall_id)}")
+                if card is not None:
+                    return card
+            except HttpError:
+                pass   # fall back to the printing / name
+
+    if set_code and set_num:
+        card = BULK_INDEX.by_print(set_code, set_num)
+        if card is not None:
+            return card
+        pkey = print_key(set_code, set_num)
+        hit, card = CARD_CACHE.get(pkey)
+        if card is not None:
+            return card
+        if not hit:
             try:
-                req = urllib.request.Request(url, headers=SCRYFALL_HEADERS)
-                with urllib.request.urlopen(req, timeout=10) as r:
-                    return json.loads(r.read())
-            except Exception:
-                pass
-        enc = urllib.parse.quote(name)
-        req = urllib.request.Request(f"https://api.scryfall.com/cards/named?fuzzy={enc}", headers=SCRYFALL_HEADERS)
-        with urllib.request.urlopen(req, timeout=10) as r:
-            return json.loads(r.read())
-    except Exception:
+                card = _fetch_card(pkey, f"{SCRYFALL_API}/cards/{set_code}/{set_num}")
+                if card is not None:
+                    return card
+            except HttpError:
+                pass   # fall back to the name lookup
+
+    card = BULK_INDEX.by_name(normalise(name))
+    if card is not None:
+        return card
+    nkey = name_key(normalise(name))
+    hit, card = CARD_CACHE.get(nkey)
+    if hit:
+        return card
+    try:
+        return _fetch_card(nkey, f"{SCRYFALL_API}/cards/named?fuzzy={urllib.parse.quote(name)}")
+    except TransientError:
+        raise
+    except HttpError:
         return None
 
-def best_image_url(obj):
+def entry_key(entry):
+    """Which card an entry asks for: its Scryfall id, printing or name."""
+    if entry.get("scryfall_id"):
+        return entry["scryfall_id"]
+    if entry.get("set_code") and entry.get("set_num"):
+        return f"{entry['set_code']}:{entry['set_num']}"
+    return normalise(entry["name"])
+
+def _collection_identifier(entry):
+    if entry.get("scryfall_id"):
+        return {"id": entry["scryfall_id"]}
+    if entry.get("set_code") and entry.get("set_num"):
+        return {"set": entry["set_code"], "collector_number": entry["set_num"]}
+    return {"name": entry["name"]}
+
+def _collection_cache_key(entry, ident):
+    if "id" in ident:
+        return id_key(ident["id"])
+    if "set" in ident:
+        return print_key(ident["set"], ident["collector_number"])
+    return name_key(normalise(entry["name"]))
+
+def _collection_flight_key(entry, ident):
+    # An unknown id or print means the same to the collection endpoint and
+    # to scryfall_get, so those share flights; an exact-name miss does not
+    # answer a fuzzy name lookup.
+    key = _collection_cache_key(entry, ident)
+    return ("collection", key) if "name" in ident else key
+
+def scryfall_collection(entries):
+    """
+    Resolve parsed deck entries in batches through POST /cards/collection.
+
+    Returns (found, not_found): `found` maps entry_key(entry) → card object,
+    `not_found` holds the keys Scryfall reported as unknown. Keys in neither
+    belong to a batch that failed outright and should go through scryfall_get.
+    Entries found in BULK_INDEX or CARD_CACHE never reach the network, and
+    identifiers another request is already resolving are waited for rather
+    than sent again.
+    """
+    found, not_found, misses = {}, set(), []
+    for entry in entries:
+        key   = entry_key(entry)
+        ident = _collection_identifier(entry)
+        if "id" in ident:
+            card = BULK_INDEX.by_id(ident["id"])
+        elif "set" in ident:
+            card = BULK_INDEX.by_print(ident["set"], ident["collector_number"])
+        else:
+            card = BULK_INDEX.by_name(normalise(entry["name"]))
+        if card is not None:
+            found[key] = card
+            continue
+        hit, card = CARD_CACHE.get(_collection_cache_key(entry, ident))
+        if card is not None:
+            found[key] = card
+        elif hit:
+            not_found.add(key)
+        else:
+            misses.append(entry)
+
+    led, joined = [], []
+    for entry in misses:
+        ident = _collection_identifier(entry)
+        fkey  = _collection_flight_key(entry, ident)
+        flight, leader = LOOKUP_FLIGHTS.begin(fkey)
+        (led if leader else joined).append((entry, ident, fkey, flight))
+    try:
+        _collection_post(led, found, not_found)
+    finally:
+        # Followers must never be left waiting, whatever happened above.
+        for _, _, fkey, flight in led:
+            if not flight.done.is_set():
+                LOOKUP_FLIGHTS.finish(fkey, flight, error=HttpError(
+                    f"{SCRYFALL_API}/cards/collection", reason="lookup abandoned"))
+
+    for entry, _, _, flight in joined:
+        try:
+            card = flight.wait()
+        except Exception:
+            continue   # left unresolved; scryfall_get retries it
+        if card is not None:
+            found[entry_key(entry)] = card
+        else:
+            not_found.add(entry_key(entry))
+    return found, not_found
+
+def _collection_post(led, found, not_found):
+    """POST the identifiers this request leads, finishing each one's flight."""
+    for start in range(0, len(led), SCRYFALL_COLLECTION_MAX):
+        chunk  = led[start:start + SCRYFALL_COLLECTION_MAX]
+        idents = [ident for _, ident, _, _ in chunk]
+        try:
+            with stage("scryfall"):
+                resp = HTTP.post_json(f"{SCRYFALL_API}/cards/collection",
+                                      {"identifiers": idents}, headers=SCRYFALL_HEADERS,
+                                      timeout=20, limiter=SCRYFALL_LIMITER)
+        except (HttpError, ValueError) as e:
+            if not isinstance(e, HttpError):
+                e = HttpError(f"{SCRYFALL_API}/cards/collection", reason="invalid response")
+            for _, _, fkey, flight in chunk:
+                LOOKUP_FLIGHTS.finish(fkey, flight, error=e)
+            continue
+
+        # Match results back by content rather than position; Scryfall drops
+        # unknown identifiers from `data` and echoes them under `not_found`.
+        by_id, by_print, by_name = {}, {}, {}
+        for card in resp.get("data", []):
+            by_id[str(card.get("id", "")).lower()] = card
+            by_print[(card.get("set", "").lower(), str(card.get("collector_number", "")))] = card
+            by_name.setdefault(normalise(card.get("name", "")), card)
+            for face in card.get("card_faces", []):
+                by_name.setdefault(normalise(face.get("name", "")), card)
+
+        for entry, ident, fkey, flight in chunk:
+            key = entry_key(entry)
+            if "id" in ident:
+                card = by_id.get(ident["id"])
+            elif "set" in ident:
+                card = by_print.get((ident["set"].lower(), ident["collector_number"]))
+            else:
+                card = by_name.get(normalise(entry["name"]))
+            if card is not None:
+                found[key] = card
+                CARD_CACHE.put(_collection_cache_key(entry, ident), card)
+            else:
+                not_found.add(key)
+                # A name miss still gets a fuzzy lookup, which caches its own
+                # outcome; an unknown id or print is definitive.
+                if "name" not in ident:
+                    CARD_CACHE.put(_collection_cache_key(entry, ident), None)
+            LOOKUP_FLIGHTS.finish(fkey, flight, card)
+
+def image_tiers(policy: str = IMAGE_POLICY, ppi: int = 300, slack: float = 1.0) -> tuple[str, ...]:
+    """
+    Image tiers to try for a card, in order of preference. Tiers narrower
+    than `ppi` (less `slack`) allows are never used. Policies:
+      auto   - the smallest tier that is sharp enough, larger ones as fallback
+      best   - the largest tier first (always png when Scryfall has one)
+      png / large / normal - that tier, larger ones as fallback
+    Raises ValueError for an unknown policy or a tier too small for `ppi`.
+    """
+    need = ppi * CARD_WIDTH_IN * slack
+    ok   = [t for t, w in sorted(IMAGE_TIERS.items(), key=lambda kv: kv[1]) if w >= need]
+    if not ok:
+        raise ValueError(f"No Scryfall image is large enough for {ppi} PPI.")
+    if policy == "auto":
+        return tuple(ok)
+    if policy == "best":
+        return tuple(reversed(ok))
+    if policy in IMAGE_TIERS and policy != "small":
+        if policy not in ok:
+            raise ValueError(f"'{policy}' images hold about {IMAGE_TIERS[policy] / CARD_WIDTH_IN:.0f} PPI, "
+                             f"too small for {ppi} PPI.")
+        return tuple(ok[ok.index(policy):])
+    raise ValueError("image_policy must be 'auto', 'best', 'png', 'large' or 'normal'.")
+
+DEFAULT_TIERS = ("png", "large", "normal", "small")
+
+# Previews are drawn at ~60 PPI, so the small "normal" JPEGs are plenty.
+PREVIEW_TIERS = ("normal", "large", "png")
+
+def pick_image(obj, tiers=DEFAULT_TIERS):
+    """(url, tier) of the first available tier in `tiers`, or (None, None)."""
     uris = obj.get("image_uris", {}) if obj else {}
-    for size in ("png", "large", "normal", "small"):
+    for size in tiers:
         if uris.get(size):
-            return uris[size]
-    return None
+            return uris[size], size
+    return None, None
+
+def best_image_url(obj, tiers=DEFAULT_TIERS):
+    return pick_image(obj, tiers)[0]
 
 def download_bytes(url):
+    """Image bytes, or None if the URL is gone; raises TransientError after retries."""
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "ProxyForge/2.0", "Accept": "*/*"})
-        with urllib.request.urlopen(req, timeout=15) as r:
-            return r.read()
-    except Exception:
+        with stage("download") as timed:
+            data = HTTP.get(url, headers={"User-Agent": "ProxyForge/2.0", "Accept": "*/*"})
+            timed.bytes = len(data)
+        return data
+    except TransientError:
+        raise
+    except HttpError:
         return None
 
+def _download_to_store(url):
+    data = download_bytes(url)
+    if data:
+        IMAGE_STORE.put(url, data)
+    return data
+
+def fetch_image(url, as_path=False):
+    """
+    Read-through IMAGE_STORE lookup. Returns (image or None, was_cached).
+    With as_path the image is the store's blob Path rather than its bytes, so
+    callers can stream large decks without holding every image in memory;
+    if the store cannot be written the downloaded bytes are returned instead.
+    """
+    if as_path:
+        blob = IMAGE_STORE.get_path(url)
+        if blob is not None:
+            return blob, True
+    else:
+        data = IMAGE_STORE.get(url)
+        if data is not None:
+            return data, True
+    # Concurrent misses for one URL share a single download.
+    data = DOWNLOAD_FLIGHTS.do(url, _download_to_store, url)
+    if data and as_path:
+        return IMAGE_STORE.path(url) or data, False
+    return data, False
+
 # ── Card fetch pipeline ────────────────────────────────────────────────────────
 
-async def fetch_all_cards(deck_list):
-    cards = parse_deck_list(deck_list)
+TRANSIENT_REASON = "Temporarily unavailable"
+CARDS_RESOLVED   = METRICS.counter("cards_total", "Deck cards reported, by status", ("status",))
+
+async def _lookup_card(entry, data=None, fuzzy_only=False):
+    """
+    (Scryfall object or None, fuzzy Match or None) for one unique card; `data`
+    is what the batch resolution already found, if anything.
+    """
+    set_code, set_num = (None, None) if fuzzy_only else (entry.get("set_code"), entry.get("set_num"))
+    scryfall_id = None if fuzzy_only else entry.get("scryfall_id")
+    match = None
+    if data is None and not (set_code and set_num) and not scryfall_id:
+        # Name-only lookup: try the local fuzzy matcher before Scryfall's.
+        match = await asyncio.to_thread(NAME_MATCHER.match, normalise(entry["name"]))
+        if match:
+            data = await asyncio.to_thread(BULK_INDEX.by_name, match.key)
+    if data is None:
+        match = None
+        data = await asyncio.to_thread(scryfall_get, set_code, set_num, entry["name"], scryfall_id)
+    return data, match
+
+def card_image_urls(data, tiers=DEFAULT_TIERS):
+    """(front_url, tier, back_url, is_flip) for a Scryfall card object."""
+    is_flip = data.get("layout", "normal") in FLIP_LAYOUTS
+    faces   = data.get("card_faces", [])
+
+    if is_flip:
+        front_url, tier = pick_image(faces[0] if faces else None, tiers)
+        if not front_url:
+            front_url, tier = pick_image(data, tiers)
+        back_url = best_image_url(faces[1], tiers) if len(faces) > 1 else None
+    else:
+        (front_url, tier), back_url = pick_image(data, tiers), None
+    return front_url, tier, back_url, is_flip
+
+async def _resolve_card(entry, sem, data=None, fuzzy_only=False, as_paths=False, tiers=DEFAULT_TIERS,
+                        resolved=None):
+    """
+    Download the face images for one unique card, looking it up first unless
+    `resolved` (a _lookup_card result) is given.
+    Returns (cached_entry, None) on success or (None, reason) on failure.
+    """
+    try:
+        return await _resolve_card_inner(entry, sem, data, fuzzy_only, as_paths, tiers, resolved)
+    except TransientError as e:
+        return None, f"{TRANSIENT_REASON} ({e}); try again"
+
+async def _resolve_card_inner(entry, sem, data, fuzzy_only, as_paths, tiers, resolved):
+    async with sem:
+        data, match = resolved or await _lookup_card(entry, data, fuzzy_only)
+        if not data:
+            return None, "Card not found on Scryfall"
+
+        front_url, tier, back_url, is_flip = card_image_urls(data, tiers)
+        if not front_url:
+            return None, "No image URL" if tiers == DEFAULT_TIERS else "No image at the requested resolution"
+
+        front_b, front_hit = await asyncio.to_thread(fetch_image, front_url, as_paths)
+        if not front_b:
+            return None, "Download failed"
+
+        back_b, back_hit = await asyncio.to_thread(fetch_image, back_url, as_paths) if back_url else (None, front_hit)
+        image_cache = "hit" if front_hit and back_hit else "miss" if not (front_hit or back_hit) else "partial"
+        resolved = {"front": front_b, "back": back_b, "flip": is_flip, "image_cache": image_cache,
+                    "image": tier}
+        if match and match.confidence < 1:
+            resolved["match"] = {"name": data.get("name", ""), "confidence": match.confidence,
+                                 "low": match.confidence < LOW_CONFIDENCE}
+        return resolved, None
+
+
+def expand_deck(deck_list):
+    """Parse a deck list into one entry per physical card, with copy suffixes."""
+    with stage("parse"):
+        cards = parse_deck_list(deck_list)
     if not cards:
         raise HTTPException(400, "Could not parse any cards.")
 
@@ -187,140 +678,779 @@ async def fetch_all_cards(deck_list):
         for n in range(1, c["qty"] + 1):
             suffix = f" ({n})" if c["qty"] > 1 else ""
             expanded.append({**c, "suffix": suffix})
+    return expanded
 
-    front_list, back_list, report, cache = [], [], [], {}
-
+def _unique_entries(expanded):
+    # One lookup per unique card (same id, printing or name); later
+    # occurrences are reported as copies of the first.
+    unique = {}
     for entry in expanded:
-        name, key, suffix = entry["name"], normalise(entry["name"]), entry["suffix"]
+        unique.setdefault(entry_key(entry), entry)
+    return unique
 
-        if key in cache:
-            cached = cache[key]
-            if cached is None:
-                report.append({"name": name, "suffix": suffix, "status": "error", "flip": False, "reason": "Lookup failed"})
-                front_list.append(None); back_list.append(None)
-                continue
-            front_list.append(cached["front"]); back_list.append(cached.get("back"))
-            report.append({"name": name, "suffix": suffix, "status": "copied", "flip": cached.get("flip", False)})
-            continue
+async def resolve_cards(expanded, concurrency: int = FETCH_CONCURRENCY):
+    """
+    Look up every unique card of an expanded deck without downloading any
+    images: {entry_key: (Scryfall object or None, Match or None)}. Raises
+    TransientError if a lookup could not be completed.
+    """
+    unique = _unique_entries(expanded)
+    with stage("resolve"):
+        found, not_found = await asyncio.to_thread(scryfall_collection, list(unique.values()))
+        sem = asyncio.Semaphore(max(1, concurrency))
 
-        data = scryfall_get(entry.get("set_code"), entry.get("set_num"), name)
-        if not data:
-            cache[key] = None
-            report.append({"name": name, "suffix": suffix, "status": "error", "flip": False, "reason": "Scryfall lookup failed"})
-            front_list.append(None); back_list.append(None)
-            continue
+        async def lookup(key, entry):
+            async with sem:
+                return key, await _lookup_card(entry, found.get(key), key in not_found)
+        return dict(await asyncio.gather(*(lookup(k, e) for k, e in unique.items())))
 
-        is_flip = data.get("layout", "normal") in FLIP_LAYOUTS
-        faces   = data.get("card_faces", [])
+async def iter_cards(expanded, concurrency: int = FETCH_CONCURRENCY, as_paths: bool = False,
+                     tiers: tuple[str, ...] = DEFAULT_TIERS, resolved: dict | None = None):
+    """
+    Resolve and download an expanded deck, yielding (report_entry, front, back)
+    in deck order as soon as each card is ready. Downloads run concurrently,
+    so later cards are usually done by the time earlier ones have been consumed.
+    `tiers` (see image_tiers) picks which Scryfall image size is downloaded;
+    `resolved` (from resolve_cards) skips the lookups.
+    """
+    unique = _unique_entries(expanded)
 
-        if is_flip:
-            front_url = best_image_url(faces[0] if faces else None) or best_image_url(data)
-            back_url  = best_image_url(faces[1]) if len(faces) > 1 else None
-        else:
-            front_url, back_url = best_image_url(data), None
+    # Batch-resolve the whole deck, then fetch images concurrently. Only the
+    # identifiers Scryfall could not match fall back to a fuzzy lookup.
+    found, not_found = {}, set()
+    if resolved is None:
+        found, not_found = await asyncio.to_thread(scryfall_collection, list(unique.values()))
 
-        if not front_url:
-            cache[key] = None
-            report.append({"name": name, "suffix": suffix, "status": "error", "flip": False, "reason": "No image URL"})
-            front_list.append(None); back_list.append(None)
-            continue
+    sem, pending = asyncio.Semaphore(max(1, concurrency)), {}
+    for key, entry in unique.items():
+        pending[key] = asyncio.ensure_future(
+            _resolve_card(entry, sem, found.get(key), fuzzy_only=key in not_found,
+                          as_paths=as_paths, tiers=tiers,
+                          resolved=resolved.get(key) if resolved else None))
 
-        front_b = download_bytes(front_url)
-        if not front_b:
-            cache[key] = None
-            report.append({"name": name, "suffix": suffix, "status": "error", "flip": False, "reason": "Download failed"})
-            front_list.append(None); back_list.append(None)
-            continue
+    seen = set()
+    try:
+        for entry in expanded:
+            name, key, suffix = entry["name"], entry_key(entry), entry["suffix"]
+            cached, reason = await pending[key]
+            first = key not in seen
+            seen.add(key)
 
-        back_b = download_bytes(back_url) if back_url else None
-        cache[key] = {"front": front_b, "back": back_b, "flip": is_flip}
-        front_list.append(front_b); back_list.append(back_b)
-        report.append({"name": name, "suffix": suffix, "status": "flip" if is_flip else "ok", "flip": is_flip})
-        await asyncio.sleep(0.08)
+            if cached is None:
+                out = {"name": name, "suffix": suffix, "status": "error", "flip": False, "reason": reason}, None, None
+            elif not first:
+                out = ({"name": name, "suffix": suffix, "status": "copied", "flip": cached.get("flip", False)},
+                       cached["front"], cached.get("back"))
+            else:
+                is_flip = cached["flip"]
+                report_entry = {"name": name, "suffix": suffix, "status": "flip" if is_flip else "ok",
+                                "flip": is_flip, "image_cache": cached["image_cache"], "image": cached["image"]}
+                if "match" in cached:
+                    report_entry["match"] = cached["match"]
+                out = report_entry, cached["front"], cached["back"]
+            CARDS_RESOLVED.inc(status=out[0]["status"])
+            yield out
+    finally:
+        # The consumer may stop early (client disconnect); don't leave
+        # downloads running for nobody.
+        for task in pending.values():
+            task.cancel()
 
+def summarise(report):
     ok     = sum(1 for r in report if r["status"] in ("ok", "flip", "copied"))
-    summary = {
-        "total":  len(expanded),
+    return {
+        "total":  len(report),
         "ok":     ok,
         "flips":  sum(1 for r in report if r.get("flip")),
         "copied": sum(1 for r in report if r["status"] == "copied"),
         "errors": sum(1 for r in report if r["status"] == "error"),
+        "image_cache_hits": sum(1 for r in report if r.get("image_cache") == "hit"),
+        "low_confidence": sum(1 for r in report if r.get("match", {}).get("low")),
     }
-    return front_list, back_list, report, summary
+
+async def fetch_all_cards(deck_list, concurrency: int = FETCH_CONCURRENCY, as_paths: bool = False,
+                          tiers: tuple[str, ...] = DEFAULT_TIERS, resolved: dict | None = None):
+    expanded = expand_deck(deck_list)
+    front_list, back_list, report = [], [], []
+    async for entry, front, back in iter_cards(expanded, concurrency, as_paths, tiers, resolved):
+        report.append(entry); front_list.append(front); back_list.append(back)
+    return front_list, back_list, report, summarise(report)
+
+# ── Result cache ───────────────────────────────────────────────────────────────
+
+# Fixed render settings; they are part of every cached PDF's key.
+RENDER_OPTIONS = {"extend_corners": 6, "quality": 90, "paper_size": "letter"}
+RESULT_FORMAT  = 1   # bump when a code change alters the output for the same inputs
+
+def result_key(kind, expanded, generic_back, options):
+    """
+    RESULT_CACHE key for a print request: the parsed deck (comments, tags and
+    "4x" / "4" spelling normalised away; order kept, as it decides the
+    layout), the generic back's content hash and every output option.
+    """
+    deck = [(e["name"], e["suffix"], e.get("set_code"), e.get("set_num"), e.get("scryfall_id"))
+            for e in expanded]
+    back = content_hash(generic_back) if generic_back else None
+    return result_digest(RESULT_FORMAT, kind, deck, back, options)
+
+async def result_version(expanded, tiers):
+    """
+    (version, resolved) for a RESULT_CACHE lookup. The version digests the
+    image URLs and names every card resolves to right now; Scryfall image
+    URLs carry the image's revision, so changed metadata or a re-scanned
+    image gives a new version and the stored result is rebuilt. `resolved`
+    can be handed to iter_cards so a rebuild does not look cards up twice.
+    (None, None) when the cache is off or a lookup failed transiently.
+    """
+    if not RESULT_CACHE.enabled:
+        return None, None
+    try:
+        resolved = await resolve_cards(expanded)
+    except TransientError:
+        return None, None
+    manifest = {key: (card_image_urls(data, tiers), data.get("name"), match) if data else None
+                for key, (data, match) in resolved.items()}
+    return result_digest(manifest), resolved
+
+def _cacheable(report):
+    """Results with transient failures in them must be rebuilt next time."""
+    return not any(r.get("reason", "").startswith(TRANSIENT_REASON) for r in report)
+
+# Proxies and servers commonly cap all response headers at 8-16 KB.
+REPORT_HEADER_MAX = 4096
+
+def _report_headers(summary, report):
+    """
+    X-Summary, plus the per-card report as X-Report when it fits in
+    REPORT_HEADER_MAX. A larger report is left out and the summary says so;
+    /api/jobs returns it in full.
+    """
+    encoded = json.dumps(report)
+    if len(encoded) > REPORT_HEADER_MAX:
+        return {"X-Summary": json.dumps({**summary, "report_omitted": True}),
+                "Access-Control-Expose-Headers": "X-Summary, ETag"}
+    return {"X-Summary": json.dumps(summary), "X-Report": encoded,
+            "Access-Control-Expose-Headers": "X-Summary, X-Report, ETag"}
+
+def _result_response(hit, if_none_match, filename, headers=None):
+    """Serve a RESULT_CACHE hit, or 304 if the client already has it."""
+    if if_none_match and (if_none_match.strip() == "*" or
+                          hit.etag in (t.strip() for t in if_none_match.split(","))):
+        return Response(status_code=304, headers={"ETag": hit.etag})
+    return FileResponse(hit.path, media_type=hit.meta["media_type"], filename=filename,
+                        headers={"ETag": hit.etag, **(headers or {})})
+
+def _tee_result(chunks, pending, report):
+    """Pass chunks through, storing them; kept only if the stream completes."""
+    with pending:
+        for chunk in chunks:
+            pending.write(chunk)
+            yield chunk
+        if not _cacheable(report):
+            pending.discard()
+        pending.meta.update(report=report, summary=summarise(report))
+
+async def _atee_result(chunks, pending, report):
+    """_tee_result for async iterators (iter_zip)."""
+    with pending:
+        async for chunk in chunks:
+            await asyncio.to_thread(pending.write, chunk)
+            yield chunk
+        if not _cacheable(report):
+            pending.discard()
+        pending.meta.update(report=report, summary=summarise(report))
+
+async def _cached_job(job, tmp, key, version):
+    """Finish a job from RESULT_CACHE if possible, replaying its card events."""
+    hit = RESULT_CACHE.get(key, version) if version else None
+    if hit is None:
+        return False
+    try:
+        await asyncio.to_thread(RESULT_CACHE.export, hit, tmp)
+    except OSError:
+        return False   # evicted since the lookup
+    report, on_card = hit.meta["report"], _card_event(job, len(hit.meta["report"]))
+    for i, entry in enumerate(report):
+        on_card(i, entry)
+    job.report, job.summary = report, {**hit.meta["summary"], "result_cache": "hit"}
+    return True
+
+# ── Streaming ZIP ──────────────────────────────────────────────────────────────
+
+class _ZipSink(io.RawIOBase):
+    """
+    Write-only, unseekable buffer for zipfile. zipfile falls back to data
+    descriptors on unseekable output, so entries can be drained and sent as
+    soon as they are written.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+def _zip_image(zout, name, image):
+    """Add one card image uncompressed; PNG/JPEG data does not deflate."""
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    if isinstance(image, Path):
+        info.file_size = image.stat().st_size
+        with open(image, "rb") as src, zout.open(info, "w") as dest:
+            shutil.copyfileobj(src, dest, 1 << 16)
+    else:
+        zout.writestr(info, image)
+
+async def iter_zip(expanded, on_card=None, tiers=DEFAULT_TIERS, resolved=None):
+    """
+    Yield a proxies.zip archive entry by entry as cards finish downloading.
+    on_card(index, report_entry) is called for every card, in deck order.
+    """
+    sink, report = _ZipSink(), []
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zout:
+        async for entry, front, back in iter_cards(expanded, as_paths=True, tiers=tiers, resolved=resolved):
+            report.append(entry)
+            if on_card:
+                on_card(len(report) - 1, entry)
+            if front is None:
+                continue
+            safe, suffix = safe_filename(entry["name"]), entry["suffix"]
+            await asyncio.to_thread(_zip_image, zout, f"fronts/{safe}{suffix}.jpg", front)
+            if back:
+                await asyncio.to_thread(_zip_image, zout, f"backs/{safe}{suffix}.jpg", back)
+            yield sink.drain()
+        zout.writestr("_report.json", json.dumps(report, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+    yield sink.drain()
 
 # ── Routes ─────────────────────────────────────────────────────────────────────
 
 @app.post("/api/resolve-url")
 async def resolve_url(url: str = Form(...)):
-    """Fetch a deck list from an Archidekt or Moxfield URL, return as plain text."""
+    """
+    Fetch a deck from an Archidekt or Moxfield URL. Returns it as deck list
+    text, with each printing's Scryfall id tagged, plus the structured entries.
+    """
     try:
-        deck_text = await asyncio.to_thread(fetch_deck_from_url, url)
-        if not deck_text.strip():
+        entries = await asyncio.to_thread(fetch_deck_entries, url)
+        if not entries:
             raise HTTPException(400, "Deck appears to be empty or private.")
-        return {"deck_list": deck_text}
+        return {"deck_list": format_deck_list(entries), "cards": entries}
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(400, str(e))
+    except NotFound:
+        raise HTTPException(404, "Deck not found; check the URL and that the deck is public.")
+    except TransientError as e:
+        raise HTTPException(503, f"Deck site temporarily unavailable ({e}); try again.")
     except Exception as e:
         raise HTTPException(502, f"Failed to fetch deck: {e}")
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for this worker's view of the shared caches."""
+    return {
+        "cards":  await asyncio.to_thread(CARD_CACHE.stats),
+        "bulk":   await asyncio.to_thread(BULK_INDEX.stats),
+        "images": IMAGE_STORE.stats(),
+        "results": RESULT_CACHE.stats(),
+        "http":   HTTP.stats(),
+        "coalesced": {"lookups": LOOKUP_FLIGHTS.stats(), "downloads": DOWNLOAD_FLIGHTS.stats()},
+    }
+
+def _stats_metrics():
+    """/metrics samples from the caches' and HTTP client's stats()."""
+    cache, flights = "Cache lookups and stores", "Lookups / downloads led, joined and failed"
+    samples = [
+        *stats_samples("cache_events", cache, CARD_CACHE.stats(), {"entries": "cache_entries"},
+                       cache="cards"),
+        *stats_samples("cache_events", cache, BULK_INDEX.stats(), cache="bulk"),
+        *stats_samples("cache_events", cache, IMAGE_STORE.stats(), cache="images"),
+        *stats_samples("cache_events", cache, RESULT_CACHE.stats(), cache="results"),
+        *stats_samples("http_events", "Outbound HTTP requests, retries and failures", HTTP.stats()),
+        *stats_samples("coalesced_events", flights, LOOKUP_FLIGHTS.stats(),
+                       {"in_flight": "coalesced_in_flight"}, kind="lookups"),
+        *stats_samples("coalesced_events", flights, DOWNLOAD_FLIGHTS.stats(),
+                       {"in_flight": "coalesced_in_flight"}, kind="downloads"),
+    ]
+    pdf_gen = sys.modules.get("pdf_gen")   # not imported until the first render
+    if pdf_gen is not None:
+        samples += stats_samples("cache_events", cache, pdf_gen.TILE_CACHE.stats(),
+                                 {"tiles": "cache_entries", "bytes": "cache_bytes"}, cache="tiles")
+    return samples
+
+METRICS.collector(_stats_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition of this worker's stage timings and counters."""
+    body = await asyncio.to_thread(METRICS.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+INDEX_PAGE = StaticPage(Path(__file__).parent / "templates" / "index.html")
+
 @app.get("/", response_class=HTMLResponse)
-async def index():
-    return HTMLResponse((Path(__file__).parent / "templates" / "index.html").read_text(encoding="utf-8"))
+async def index(
+    accept_encoding: str | None = Header(None),
+    if_none_match:   str | None = Header(None),
+):
+    body, headers = INDEX_PAGE.select(accept_encoding)
+    if INDEX_PAGE.not_modified(if_none_match, headers["ETag"]):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=INDEX_PAGE.media_type, headers=headers)
+
+
+def _request_tiers(image_policy: str, ppi: int, kind: str) -> tuple[str, ...]:
+    """image_tiers() for a request's form fields, as a 400 on bad input."""
+    if not 72 <= ppi <= 1200:
+        raise HTTPException(400, "ppi must be between 72 and 1200.")
+    try:
+        return image_tiers(image_policy, ppi, 1.0 if kind == "zip" else IMAGE_PPI_SLACK)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+def _sheet_layout(backs: str, group_flips: bool = False) -> dict:
+    """plan_sheets() options for a request's form fields, as a 400 on bad input."""
+    from pdf_gen import BACKS_MODES
+
+    if backs not in BACKS_MODES:
+        raise HTTPException(400, f"backs must be one of: {', '.join(BACKS_MODES)}.")
+    return {"backs": backs, "group_flips": group_flips}
 
+async def _print_options(generic_back: UploadFile | None, backs: str, group_flips: bool = False,
+                         backend: str = "raster", image_policy: str | None = None, ppi: int = 300,
+                         kind: str = "pdf"):
+    """
+    The form fields every sheet-building endpoint shares, validated (a 400 on
+    bad input): (generic_back bytes or None, image tiers, plan_sheets()
+    options). Without an image_policy (previews) the tiers are PREVIEW_TIERS.
+    """
+    if backend not in ("raster", "embed"):
+        raise HTTPException(400, "backend must be 'raster' or 'embed'.")
+    tiers  = _request_tiers(image_policy, ppi, kind) if image_policy else PREVIEW_TIERS
+    layout = _sheet_layout(backs, group_flips)
+    generic_back_bytes = None
+    if generic_back and generic_back.filename:
+        generic_back_bytes = await generic_back.read()
+    return generic_back_bytes, tiers, layout
 
 @app.post("/api/download")
-async def api_download(deck_list: str = Form(...)):
-    front_list, back_list, report, summary = await fetch_all_cards(deck_list)
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zout:
-        for i, r in enumerate(report):
-            fb = front_list[i]
-            if fb is None:
-                continue
-            safe, suffix = safe_filename(r["name"]), r["suffix"]
-            zout.writestr(f"fronts/{safe}{suffix}.jpg", fb)
-            bb = back_list[i]
-            if bb:
-                zout.writestr(f"backs/{safe}{suffix}.jpg", bb)
-        zout.writestr("_report.json", json.dumps(report, indent=2))
-    buf.seek(0)
-    return StreamingResponse(buf, media_type="application/zip", headers={
-        "Content-Disposition": "attachment; filename=proxies.zip",
-        "X-Summary": json.dumps(summary), "X-Report": json.dumps(report),
-        "Access-Control-Expose-Headers": "X-Summary, X-Report",
-    })
+async def api_download(
+    deck_list:      str        = Form(...),
+    image_policy:   str        = Form(IMAGE_POLICY),
+    ppi:            int        = Form(300),
+    if_none_match:  str | None = Header(None),
+):
+    # Entries are streamed as cards arrive, so the per-card report cannot go
+    # in headers; it is the archive's last entry, _report.json.
+    tiers    = _request_tiers(image_policy, ppi, "zip")
+    expanded = expand_deck(deck_list)
+    key      = result_key("zip", expanded, None, {"tiers": tiers})
+    version, resolved = await result_version(expanded, tiers)
+    hit = RESULT_CACHE.get(key, version) if version else None
+    if hit:
+        return _result_response(hit, if_none_match, "proxies.zip")
+
+    report  = []
+    chunks  = iter_zip(expanded, lambda i, entry: report.append(entry), tiers, resolved)
+    pending = RESULT_CACHE.open(key, version, {"media_type": "application/zip"}) if version else None
+    headers = {"Content-Disposition": "attachment; filename=proxies.zip"}
+    if pending:
+        chunks = _atee_result(chunks, pending, report)
+        headers["ETag"] = RESULT_CACHE.etag(key, version)
+    return StreamingResponse(chunks, media_type="application/zip", headers=headers)
 
 
 @app.post("/api/pdf")
 async def api_pdf(
     deck_list:      str        = Form(...),
     generic_back:   UploadFile = File(None),
+    backend:        str        = Form("raster"),
+    image_policy:   str        = Form(IMAGE_POLICY),
+    ppi:            int        = Form(300),
+    backs:          str        = Form("auto"),
+    group_flips:    bool       = Form(False),
+    if_none_match:  str | None = Header(None),
 ):
-    from pdf_gen import build_pdf
-
-    generic_back_bytes = None
-    if generic_back and generic_back.filename:
-        generic_back_bytes = await generic_back.read()
+    from pdf_gen import iter_pdf
 
-    front_list, back_list, report, summary = await fetch_all_cards(deck_list)
+    generic_back_bytes, tiers, layout = await _print_options(
+        generic_back, backs, group_flips, backend, image_policy, ppi)
+    options  = {"backend": backend, **RENDER_OPTIONS, **layout}
+    expanded = expand_deck(deck_list)
+    key      = result_key("pdf", expanded, generic_back_bytes, {**options, "tiers": tiers})
+    version, resolved = await result_version(expanded, tiers)
+    hit = RESULT_CACHE.get(key, version) if version else None
+    if hit:
+        summary = {**hit.meta["summary"], "result_cache": "hit"}
+        return _result_response(hit, if_none_match, f"proxies_{summary['ok']}cards.pdf",
+                                _report_headers(summary, hit.meta["report"]))
 
-    fronts, backs = [], []
-    for fb, bb in zip(front_list, back_list):
-        if fb is not None:
-            fronts.append(fb)
-            backs.append(bb)
+    # Images stay on disk in IMAGE_STORE; iter_pdf reads them sheet by sheet.
+    front_list, back_list, report, summary = await fetch_all_cards(
+        deck_list, as_paths=True, tiers=tiers, resolved=resolved)
 
+    fronts = [f for f in front_list if f is not None]
     if not fronts:
         raise HTTPException(400, "No cards were successfully downloaded.")
 
-    pdf_bytes = build_pdf(
+    # A sync generator: Starlette drives it from its threadpool, so rendering
+    # stays off the event loop and each sheet is sent as soon as it is encoded.
+    pdf_chunks = iter_pdf(
         front_images=fronts,
-        back_images=backs,
+        back_images=[b for f, b in zip(front_list, back_list) if f is not None],
         generic_back=generic_back_bytes,
+        **options,
     )
 
-    return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers={
+    headers = {
         "Content-Disposition": f"attachment; filename=proxies_{summary['ok']}cards.pdf",
-        "X-Summary": json.dumps(summary), "X-Report": json.dumps(report),
-        "Access-Control-Expose-Headers": "X-Summary, X-Report",
+        **_report_headers(summary, report),
+    }
+    pending = RESULT_CACHE.open(key, version, {"media_type": "application/pdf"}) if version else None
+    if pending:
+        pdf_chunks = _tee_result(pdf_chunks, pending, report)
+        headers["ETag"] = RESULT_CACHE.etag(key, version)
+    return StreamingResponse(pdf_chunks, media_type="application/pdf", headers=headers)
+
+
+@app.post("/api/preview")
+async def api_preview(
+    deck_list:      str        = Form(...),
+    generic_back:   UploadFile = File(None),
+    fmt:            str        = Form("webp"),
+    scale:          float      = Form(None),
+    backs:          str        = Form("auto"),
+    group_flips:    bool       = Form(False),
+):
+    """
+    Low-resolution sheet thumbnails in the exact print layout, for checking
+    card selection and flips before building the PDF. Returns the report and
+    one data: URI per sheet side.
+    """
+    from pdf_gen import PREVIEW_SCALE, iter_preview
+
+    if fmt not in ("webp", "png"):
+        raise HTTPException(400, "fmt must be 'webp' or 'png'.")
+    scale = scale or PREVIEW_SCALE
+    if not 0.05 <= scale <= 0.5:
+        raise HTTPException(400, "scale must be between 0.05 and 0.5.")
+    generic_back_bytes, tiers, layout = await _print_options(generic_back, backs, group_flips)
+
+    front_list, back_list, report, summary = await fetch_all_cards(
+        deck_list, as_paths=True, tiers=tiers)
+    fronts = [f for f in front_list if f is not None]
+    card_backs = [b for f, b in zip(front_list, back_list) if f is not None]
+    if not fronts:
+        raise HTTPException(400, "No cards were successfully downloaded.")
+
+    sheets = await asyncio.to_thread(lambda: list(iter_preview(
+        fronts, card_backs, generic_back_bytes, scale=scale, fmt=fmt, **layout)))
+    return {
+        "summary": summary,
+        "report":  report,
+        "sheets":  [{"page": page_num + 1, "side": "back" if is_back else "front",
+                     "image": f"data:image/{fmt};base64,{base64.b64encode(data).decode()}"}
+                    for page_num, is_back, data in sheets],
+    }
+
+
+# ── Background jobs ────────────────────────────────────────────────────────────
+
+def _card_event(job, total):
+    def on_card(index, entry):
+        job.emit("card", {"index": index, "total": total, **entry})
+    return on_card
+
+async def _run_zip_job(job, tmp, expanded, tiers):
+    key = result_key("zip", expanded, None, {"tiers": tiers})
+    version, resolved = await result_version(expanded, tiers)
+    if await _cached_job(job, tmp, key, version):
+        return
+
+    report, emit_card = [], _card_event(job, len(expanded))
+    def on_card(index, entry):
+        report.append(entry)
+        emit_card(index, entry)
+    with open(tmp, "wb") as f:
+        async for chunk in iter_zip(expanded, on_card, tiers, resolved):
+            await asyncio.to_thread(f.write, chunk)
+    job.report, job.summary = report, summarise(report)
+    if version and _cacheable(report):
+        await asyncio.to_thread(RESULT_CACHE.put_file, key, version, tmp, {
+            "media_type": "application/zip", "summary": job.summary, "report": report})
+
+async def _run_pdf_job(job, tmp, expanded, generic_back_bytes, backend, tiers, layout):
+    from pdf_gen import iter_pdf
+
+    options = {"backend": backend, **RENDER_OPTIONS, **layout}
+    key     = result_key("pdf", expanded, generic_back_bytes, {**options, "tiers": tiers})
+    version, resolved = await result_version(expanded, tiers)
+    if await _cached_job(job, tmp, key, version):
+        return
+
+    on_card = _card_event(job, len(expanded))
+    fronts, backs, report = [], [], []
+    async for entry, front, back in iter_cards(expanded, as_paths=True, tiers=tiers, resolved=resolved):
+        report.append(entry)
+        on_card(len(report) - 1, entry)
+        if front is not None:
+            fronts.append(front)
+            backs.append(back)
+    job.report, job.summary = report, summarise(report)
+
+    if not fronts:
+        raise HTTPException(400, "No cards were successfully downloaded.")
+
+    def render():
+        with open(tmp, "wb") as f:
+            for chunk in iter_pdf(
+                front_images=fronts,
+                back_images=backs,
+                generic_back=generic_back_bytes,
+                on_sheet=lambda done, total: job.emit_threadsafe("render", {"done": done, "total": total}),
+                **options,
+            ):
+                f.write(chunk)
+    await asyncio.to_thread(render)
+    if version and _cacheable(report):
+        await asyncio.to_thread(RESULT_CACHE.put_file, key, version, tmp, {
+            "media_type": "application/pdf", "summary": job.summary, "report": report})
+
+@app.post("/api/jobs")
+async def create_job(
+    deck_list:      str        = Form(...),
+    kind:           str        = Form("pdf"),
+    generic_back:   UploadFile = File(None),
+    backend:        str        = Form("raster"),
+    image_policy:   str        = Form(IMAGE_POLICY),
+    ppi:            int        = Form(300),
+    backs:          str        = Form("auto"),
+    group_flips:    bool       = Form(False),
+):
+    """Queue a PDF or ZIP build; follow it at /api/jobs/{id}/events."""
+    if kind not in ("pdf", "zip"):
+        raise HTTPException(400, "kind must be 'pdf' or 'zip'.")
+    generic_back_bytes, tiers, layout = await _print_options(
+        generic_back, backs, group_flips, backend, image_policy, ppi, kind)
+    expanded = expand_deck(deck_list)
+
+    try:
+        if kind == "zip":
+            job = JOBS.submit("zip", ".zip", "application/zip", "proxies.zip",
+                              lambda job, tmp: _run_zip_job(job, tmp, expanded, tiers))
+        else:
+            job = JOBS.submit("pdf", ".pdf", "application/pdf", "proxies.pdf",
+                              lambda job, tmp: _run_pdf_job(job, tmp, expanded, generic_back_bytes,
+                                                                    backend, tiers, layout))
+    except JobQueueFull as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "10"})
+    return {"id": job.id, "status": job.status}
+
+async def _run_batch_job(job, tmp, decks, urls, labels, output, generic_back_bytes, backend, tiers,
+                         backs="auto"):
+    """
+    Print several decks as one job. `decks` holds the already-expanded text
+    decks; `urls` are fetched here and appended. Every card of every deck
+    goes through a single iter_cards pass, so cards shared between decks are
+    looked up, downloaded and decoded once.
+    """
+    from pdf_gen import deck_notes, iter_pdf, plan_sheets
+
+    async def fetch(url):
+        try:
+            return expand_deck(await asyncio.to_thread(fetch_deck_from_url, url))
+        except HTTPException:
+            raise HTTPException(400, f"{url}: could not parse any cards.")
+        except (ValueError, HttpError) as e:
+            raise HTTPException(502, f"{url}: {e}")
+    decks = decks + list(await asyncio.gather(*(fetch(u) for u in urls)))
+
+    expanded = [{**entry, "deck": i} for i, deck in enumerate(decks) for entry in deck]
+    per_deck = [{"fronts": [], "backs": [], "report": []} for _ in decks]
+    report, on_card = [], _card_event(job, len(expanded))
+    async for entry, front, back in iter_cards(expanded, as_paths=True, tiers=tiers):
+        d = expanded[len(report)]["deck"]
+        entry = {**entry, "deck": labels[d]}
+        report.append(entry)
+        on_card(len(report) - 1, entry)
+        per_deck[d]["report"].append(entry)
+        if front is not None:
+            per_deck[d]["fronts"].append(front)
+            per_deck[d]["backs"].append(back)
+    job.report  = report
+    job.summary = {**summarise(report),
+                   "decks": [{"name": label, **summarise(d["report"])}
+                             for label, d in zip(labels, per_deck)]}
+
+    if not any(d["fronts"] for d in per_deck):
+        raise HTTPException(400, "No cards were successfully downloaded.")
+
+    def sheets(d):
+        return len(plan_sheets(d["fronts"], d["backs"], generic_back_bytes, backs))
+
+    def progress(done, total):
+        job.emit_threadsafe("render", {"done": done, "total": total})
+
+    def render():
+        with open(tmp, "wb") as f:
+            if output == "pdf":
+                # All decks back to back on shared sheets; labels say whose
+                # cards are in which slots.
+                for chunk in iter_pdf(
+                    front_images=[x for d in per_deck for x in d["fronts"]],
+                    back_images=[x for d in per_deck for x in d["backs"]],
+                    generic_back=generic_back_bytes,
+                    backend=backend,
+                    on_sheet=progress,
+                    backs=backs,
+                    notes=deck_notes([(label, len(d["fronts"])) for label, d in zip(labels, per_deck)]),
+                ):
+                    f.write(chunk)
+                return
+            # One PDF per deck; the PDFs are mostly JPEG data, so store them.
+            total, done = sum(sheets(d) for d in per_deck if d["fronts"]), 0
+            with zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as zout:
+                for i, (label, d) in enumerate(zip(labels, per_deck), 1):
+                    if not d["fronts"]:
+                        continue
+                    info = zipfile.ZipInfo(f"{i:02d} {safe_filename(label)}.pdf",
+                                           date_time=time.localtime()[:6])
+                    with zout.open(info, "w", force_zip64=True) as dest:
+                        for chunk in iter_pdf(
+                            front_images=d["fronts"],
+                            back_images=d["backs"],
+                            generic_back=generic_back_bytes,
+                            backend=backend,
+                            on_sheet=lambda n, _, base=done: progress(base + n, total),
+                            backs=backs,
+                        ):
+                            dest.write(chunk)
+                    done += sheets(d)
+                zout.writestr("_report.json", json.dumps(report, indent=2),
+                              compress_type=zipfile.ZIP_DEFLATED)
+    await asyncio.to_thread(render)
+
+@app.post("/api/batch")
+async def create_batch(
+    deck_lists:     list[str]  = Form([]),
+    urls:           list[str]  = Form([]),
+    names:          list[str]  = Form([]),
+    output:         str        = Form("pdf"),
+    generic_back:   UploadFile = File(None),
+    backend:        str        = Form("raster"),
+    image_policy:   str        = Form(IMAGE_POLICY),
+    ppi:            int        = Form(300),
+    backs:          str        = Form("auto"),
+):
+    """
+    Queue a multi-deck print job: repeat `deck_lists` and/or `urls` once per
+    deck, optionally with matching `names` (deck lists first, then URLs).
+    `output` is "pdf" for one PDF with all decks packed onto shared sheets,
+    or "zip" for one PDF per deck. Follow it like any other job. Flipped
+    cards are not regrouped here: that would break the per-deck sheet labels.
+    """
+    deck_lists = [d for d in deck_lists if d.strip()]
+    urls       = [u.strip() for u in urls if u.strip()]
+    count      = len(deck_lists) + len(urls)
+    if not count:
+        raise HTTPException(400, "Provide at least one deck list or URL.")
+    if count > BATCH_MAX_DECKS:
+        raise HTTPException(400, f"At most {BATCH_MAX_DECKS} decks per batch.")
+    if output not in ("pdf", "zip"):
+        raise HTTPException(400, "output must be 'pdf' or 'zip'.")
+    # group_flips stays off for batches; only the backs mode is used.
+    generic_back_bytes, tiers, _ = await _print_options(generic_back, backs, False, backend,
+                                                        image_policy, ppi)
+
+    labels = [names[i].strip() if i < len(names) and names[i].strip() else f"Deck {i + 1}"
+              for i in range(count)]
+    decks = []
+    for label, text in zip(labels, deck_lists):
+        try:
+            decks.append(expand_deck(text))
+        except HTTPException:
+            raise HTTPException(400, f"{label}: could not parse any cards.")
+
+    media_type = "application/pdf" if output == "pdf" else "application/zip"
+    try:
+        job = JOBS.submit("batch", f".{output}", media_type, f"proxies_batch.{output}",
+                          lambda job, tmp: _run_batch_job(job, tmp, decks, urls, labels, output,
+                                                          generic_back_bytes, backend, tiers, backs))
+    except JobQueueFull as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "10"})
+    return {"id": job.id, "status": job.status}
+
+def _get_job(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown or expired job.")
+    return job
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _get_job(job_id).describe()
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events: status, card, render, then done or failed."""
+    job = _get_job(job_id)
+
+    async def stream():
+        async for event in job.follow():
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            name, data = event
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache", "X-Accel-Buffering": "no",
     })
+
+@app.get("/api/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = _get_job(job_id)
+    if job.status == "failed":
+        raise HTTPException(422, job.error)
+    if job.status != "done":
+        raise HTTPException(409, f"Job is {job.status}.")
+    filename = job.filename
+    if job.kind == "pdf":
+        filename = f"proxies_{job.summary['ok']}cards.pdf"
+    return FileResponse(job.path, media_type=job.media_type, filename=filename, headers={
+        "X-Summary": json.dumps(job.summary),
+        "Access-Control-Expose-Headers": "X-Summary",
+    })
+
+
+# ── Start-up ───────────────────────────────────────────────────────────────────
+
+# Importing main only sets things up; connections, PIL and the renderer are
+# loaded on first use. On a fresh (e.g. serverless) instance that first use
+# is a user's first click, so by default a background thread gets them ready
+# while the index page is being served. PROXYFORGE_WARMUP=0 turns it off.
+WARMUP = os.environ.get("PROXYFORGE_WARMUP", "1") != "0"
+
+def warm_up():
+    """Do the one-off work the first print request would otherwise wait for."""
+    from PIL import Image
+
+    import pdf_gen  # noqa: F401  (Pillow, the renderer, TILE_CACHE)
+
+    Image.init()   # every codec plugin; WebP previews need more than preinit() loads
+    INDEX_PAGE.precompress()
+    NAME_MATCHER.warm()
+
+if WARMUP:
+    threading.Thread(target=warm_up, name="proxyforge-warmup", daemon=True).start()
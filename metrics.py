@@ -0,0 +1,337 @@
+"""
+metrics.py - ProxyForge request timing and Prometheus metrics
+
+Shows where a slow print spent its time (Scryfall lookups, image
+transfer, tile decoding, sheet encoding) without attaching a profiler:
+
+  - stage(name) times one step of the hot path and records its duration
+    and byte count twice: into the current request's Timings and into
+    process-wide histograms
+  - TimingMiddleware gives every HTTP request a Timings and sends it as a
+    Server-Timing header: per stage the summed duration, with call count
+    and bytes in the description, plus `total`. Stages that run in
+    parallel sum past the wall clock. Work still running when the headers
+    go out (the sheets of a streamed PDF) is only counted in /metrics
+  - Timings follow a request into asyncio.to_thread() calls through
+    contextvars; bind() carries them into other thread pools, and track()
+    gives a background job its own
+  - render() writes the Prometheus text format for /metrics: the stage and
+    request histograms, counters made with counter(), and the samples that
+    registered collectors report (cache and HTTP client stats)
+
+Recording a stage costs two perf_counter() calls, two uncontended locks and
+a bisect, so this is meant to stay on in production. Numbers are per
+process, like /api/cache/stats.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+PREFIX          = "proxyforge"
+STAGE_BUCKETS   = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class Sample(NamedTuple):
+    """One collector-reported value; `kind` is "counter" or "gauge"."""
+    name:   str
+    kind:   str
+    help:   str
+    labels: dict
+    value:  float
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(int(v))
+
+
+class Histogram:
+    """Fixed-bucket histogram; callers hold the owning registry's lock."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts  = [0] * (len(buckets) + 1)
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum   += value
+        self.count += 1
+
+    def lines(self, name: str, labels: dict) -> Iterator[str]:
+        cumulative = 0
+        for bound, n in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += n
+            yield f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}"
+        yield f"{name}_sum{_labels(labels)} {self.sum!r}"
+        yield f"{name}_count{_labels(labels)} {self.count}"
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], lock: threading.Lock):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._lock   = lock
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, n: float = 1, **labels) -> None:
+        key = tuple(labels[k] for k in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def lines(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(dict(zip(self.labelnames, key)))} {_number(value)}"
+
+
+class Timings:
+    """One request's (or job's) stages: name → [seconds, calls, bytes]."""
+
+    def __init__(self):
+        self.start  = time.perf_counter()
+        self.end: float | None = None
+        self.stages: dict[str, list] = {}
+        self._lock  = threading.Lock()
+
+    def add(self, name: str, seconds: float, nbytes: int = 0) -> None:
+        with self._lock:
+            s = self.stages.get(name)
+            if s is None:
+                s = self.stages[name] = [0.0, 0, 0]
+            s[0] += seconds
+            s[1] += 1
+            s[2] += nbytes
+
+    def stop(self) -> None:
+        """Freeze `total` (e.g. when a job finishes)."""
+        self.end = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def as_dict(self) -> dict:
+        """{"total_ms": ..., "stages": {name: {"ms", "calls", "bytes"}}}, for JSON."""
+        with self._lock:
+            stages = {name: {"ms": round(sec * 1000, 1), "calls": calls, "bytes": nbytes}
+                      for name, (sec, calls, nbytes) in self.stages.items()}
+        return {"total_ms": round(self.elapsed() * 1000, 1), "stages": stages}
+
+    def header(self) -> str:
+        """Server-Timing header value."""
+        parts = []
+        with self._lock:
+            for name, (sec, calls, nbytes) in self.stages.items():
+                desc = f"{calls} call{'s' if calls != 1 else ''}" + (f", {nbytes} B" if nbytes else "")
+                parts.append(f'{name};dur={sec * 1000:.1f};desc="{desc}"')
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_CURRENT: contextvars.ContextVar[Timings | None] = contextvars.ContextVar("proxyforge_timings",
+                                                                         default=None)
+
+
+class Metrics:
+    """Process-wide registry behind /metrics."""
+
+    def __init__(self):
+        self._lock       = threading.Lock()
+        self._stages:    dict[str, Histogram] = {}
+        self._bytes:     dict[str, int] = {}
+        self._requests:  dict[str, Histogram] = {}
+        self._jobs:      dict[tuple[str, str], Histogram] = {}
+        self._counters:  list[Counter] = []
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+        self.responses = self.counter("responses_total", "HTTP responses by route and status",
+                                      ("route", "status"))
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        c = Counter(f"{PREFIX}_{name}", help, tuple(labelnames), self._lock)
+        self._counters.append(c)
+        return c
+
+    def collector(self, fn: Callable[[], Iterable[Sample]]) -> None:
+        """Register fn() to add Samples at every render(); it may block briefly."""
+        self._collectors.append(fn)
+
+    def observe_stage(self, name: str, seconds: float, nbytes: int = 0) -> None:
+        with self._lock:
+            h = self._stages.get(name)
+            if h is None:
+                h = self._stages[name] = Histogram(STAGE_BUCKETS)
+            h.observe(seconds)
+            if nbytes:
+                self._bytes[name] = self._bytes.get(name, 0) + nbytes
+
+    def observe_request(self, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            h = self._requests.get(route)
+            if h is None:
+                h = self._requests[route] = Histogram(REQUEST_BUCKETS)
+            h.observe(seconds)
+        self.responses.inc(route=route, status=str(status))
+
+    def observe_job(self, kind: str, status: str, seconds: float) -> None:
+        with self._lock:
+            h = self._jobs.get((kind, status))
+            if h is None:
+                h = self._jobs[(kind, status)] = Histogram(REQUEST_BUCKETS)
+            h.observe(seconds)
+
+    def render(self) -> str:
+        """The Prometheus text exposition format (version 0.0.4)."""
+        samples = [s for fn in self._collectors for s in fn()]
+        out = []
+
+        def family(name, kind, help):
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            name = f"{PREFIX}_stage_seconds"
+            family(name, "histogram", "Time spent per hot-path stage")
+            for stage, h in sorted(self._stages.items()):
+                out.extend(h.lines(name, {"stage": stage}))
+            name = f"{PREFIX}_stage_bytes_total"
+            family(name, "counter", "Bytes moved per stage (downloads, encoded sheets)")
+            for stage, n in sorted(self._bytes.items()):
+                out.append(f"{name}{_labels({'stage': stage})} {n}")
+            name = f"{PREFIX}_request_seconds"
+            family(name, "histogram", "HTTP request duration until the last byte is sent, by route")
+            for route, h in sorted(self._requests.items()):
+                out.extend(h.lines(name, {"route": route}))
+            name = f"{PREFIX}_job_seconds"
+            family(name, "histogram", "Background job run time, by kind and outcome")
+            for (kind, status), h in sorted(self._jobs.items()):
+                out.extend(h.lines(name, {"kind": kind, "status": status}))
+            for c in self._counters:
+                family(c.name, "counter", c.help)
+                out.extend(c.lines())
+
+        # A family's samples must be contiguous, whichever collector sent them.
+        families: dict[str, list[Sample]] = {}
+        for s in samples:
+            families.setdefault(s.name, []).append(s)
+        for name, group in families.items():
+            family(f"{PREFIX}_{name}", group[0].kind, group[0].help)
+            out.extend(f"{PREFIX}_{name}{_labels(s.labels)} {_number(s.value)}" for s in group)
+        return "\n".join(out) + "\n"
+
+
+METRICS = Metrics()
+
+
+def stats_samples(name: str, help: str, stats: dict, gauges: dict[str, str] | None = None,
+                  **labels) -> list[Sample]:
+    """
+    Samples for a component's stats() dict: every numeric key becomes an
+    `event` of the `{name}_total` counter, except the keys in `gauges`,
+    which map to the gauge they are reported as. Ratios and flags are left out.
+    """
+    out, gauges = [], gauges or {}
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or key.endswith("_rate"):
+            continue
+        if key in gauges:
+            out.append(Sample(gauges[key], "gauge", f"Current {key.replace('_', ' ')}", labels, value))
+        else:
+            out.append(Sample(f"{name}_total", "counter", help, {**labels, "event": key}, value))
+    return out
+
+
+# ── Recording ────────────────────────────────────────────────────────────────
+class stage:
+    """
+    Context manager timing one hot-path step; set `.bytes` inside the block
+    to count data moved. Recorded even if the block raises.
+    """
+
+    __slots__ = ("name", "bytes", "_t0")
+
+    def __init__(self, name: str):
+        self.name  = name
+        self.bytes = 0
+
+    def __enter__(self) -> "stage":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        seconds = time.perf_counter() - self._t0
+        METRICS.observe_stage(self.name, seconds, self.bytes)
+        timings = _CURRENT.get()
+        if timings is not None:
+            timings.add(self.name, seconds, self.bytes)
+
+
+def bind(fn: Callable) -> Callable:
+    """fn, recording its stages into the caller's Timings from any thread."""
+    timings = _CURRENT.get()
+    if timings is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _CURRENT.set(timings)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _CURRENT.reset(token)
+    return run
+
+
+@contextlib.contextmanager
+def track(timings: Timings) -> Iterator[Timings]:
+    """Record the stages of the enclosed code (and its to_thread calls) into `timings`."""
+    token = _CURRENT.set(timings)
+    try:
+        yield timings
+    finally:
+        _CURRENT.reset(token)
+
+
+# ── ASGI middleware ──────────────────────────────────────────────────────────
+class TimingMiddleware:
+    """A Timings per HTTP request, sent as Server-Timing and fed to METRICS."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = Timings()
+        status  = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status  = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"server-timing", timings.header().encode())]}
+            await send(message)
+
+        try:
+            with track(timings):
+                await self.app(scope, receive, send_timed)
+        finally:
+            # Routed path templates only (/api/jobs/{job_id}), so label
+            # values stay bounded whatever clients request.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            METRICS.observe_request(route, status, timings.elapsed())
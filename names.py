@@ -0,0 +1,16 @@
+"""
+names.py - ProxyForge card name normalisation
+
+The one definition of how card names are compared, shared by the request
+path (main.py), the offline index (bulk_index.py) and its fuzzy matcher:
+lower-case, with everything but ASCII letters and digits removed, so
+"Fire // Ice", "fire ice" and "FIREICE" are the same key.
+"""
+
+import re
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+
+
+def normalise(name: str) -> str:
+    return _NON_ALNUM.sub("", name.lower())
@@ -12,16 +12,66 @@ structure used by Alan-Cha/silhouette-card-maker:
     placing, bleeding past the slot boundary to fix rounded-corner artifacts
   - Alternating front/back pages; backs mirrored horizontally to align
     when the sheet is physically flipped on the short axis
-  - PDF produced via Pillow → img2pdf pipeline (300 PPI, correct page size)
+  - plan_sheets() decides the pages before anything is drawn: back sheets
+    are dropped when no card has a back (or on request), flip cards can be
+    grouped into a trailing duplex section, and sheet sides with identical
+    placements (e.g. full generic-back pages) share one rendered image
+  - Each raster sheet is one Pillow-composited 300 PPI JPEG; page labels are
+    vector text on top, so identical sheets are encoded and stored once
+  - Decoded, resized card tiles are memoised in TILE_CACHE, so repeated
+    cards (basics, generic_back) are decoded and resampled only once. It
+    holds a few sheets' worth in memory, which stays allocated between
+    requests; the optional disk tier keeps the rest
+  - Sheets are independent, so they are rendered on a thread pool (Pillow
+    releases the GIL while resampling, pasting and JPEG-encoding); output
+    order and bytes are identical to a single-threaded run. The pool is
+    shared by all requests, which caps render threads and page memory per
+    process
+  - iter_pdf() streams the same sheets as PDF bytes while they render, so
+    peak memory stays at a few sheets regardless of deck size. Card images
+    may be passed as ImageStore blob paths instead of in-memory bytes
+  - backend="embed" skips rasterising sheets altogether: each distinct card
+    image becomes one shared image XObject placed by transform matrix, and
+    reg marks / labels are drawn as vector operators
+  - iter_preview() draws the same layout at a fraction of the resolution as
+    WebP/PNG thumbnails, decoding JPEGs at reduced scale, for quick checks
+    before the full PDF is built
+  - Tile decodes, sheet encodes and image conversions are timed as the
+    "decode", "encode" and "embed" stages (metrics.py); render threads
+    record into the Timings of the request that started them
 """
 
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from pathlib import Path
+from typing import Callable, Iterator
+from typing import NamedTuple
 from PIL import Image, ImageDraw
-import img2pdf
+
+from image_store import ImageStore, content_hash
+from metrics import METRICS, bind, stage
 
 # ── Resolution ───────────────────────────────────────────────────────────────
 PPI = 300
 
+# Card image sources: raw bytes, or the Path of an ImageStore blob (whose file
+# name is the sha256 of its contents, so it doubles as the tile cache key).
+ImageSource = bytes | Path
+
+# ── Parallel rendering ───────────────────────────────────────────────────────
+RENDER_WORKERS = int(os.environ.get("PROXYFORGE_RENDER_WORKERS", 0)) or (os.cpu_count() or 1)
+
+# Shared by every request, so at most RENDER_WORKERS sheets (each a full
+# 3300 × 2550 page in memory) are composed at once however many PDFs are
+# being built. Threads are started on first use.
+_RENDER_POOL = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+
+SHEETS_RENDERED = METRICS.counter("sheets_rendered_total",
+                                  "Distinct sheet sides composed, by backend", ("backend",))
+
 # ── Page dimensions — landscape letter at 300 PPI ────────────────────────────
 # 11 × 8.5 inches → 3300 × 2550 px
 PAGE_W_PX = 3300
@@ -62,37 +112,124 @@ GRID_X = (PAGE_W_PX - GRID_BLOCK_W) // 2
 GRID_Y = (PAGE_H_PX - GRID_BLOCK_H) // 2
 
 
+
+# ── Tile cache ───────────────────────────────────────────────────────────────
+class TileCache:
+    """
+    Bounded LRU of ready-to-paste RGB card tiles.
+
+    Keys combine the source image's content hash with every parameter that
+    affects the tile (target size, extend_corners). An optional ImageStore
+    directory keeps raw tile pixels on disk across requests. The budget is
+    charged at Pillow's in-memory size: 4 bytes per pixel, even for "RGB".
+    """
+
+    def __init__(self, max_bytes: int, disk: ImageStore | None = None):
+        self.max_bytes = max_bytes
+        self.disk      = disk
+        self._tiles: OrderedDict[str, Image.Image] = OrderedDict()
+        self._bytes    = 0
+        self._lock     = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(digest: str, extend_corners: int,
+            size: tuple[int, int] = (CARD_W_PX, CARD_H_PX)) -> str:
+        return f"{digest}:{size[0]}x{size[1]}:ec{extend_corners}"
+
+    @staticmethod
+    def _size(tile: Image.Image) -> int:
+        return tile.width * tile.height * 4
+
+    def get(self, key: str, size: tuple[int, int]) -> Image.Image | None:
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self._counters["hits"] += 1
+                return tile
+        raw = self.disk.get(key) if self.disk else None
+        if raw is not None and len(raw) == size[0] * size[1] * 3:
+            tile = Image.frombytes("RGB", size, raw)
+            self._remember(key, tile)
+            with self._lock:
+                self._counters["disk_hits"] += 1
+            return tile
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def put(self, key: str, tile: Image.Image) -> None:
+        self._remember(key, tile)
+        if self.disk:
+            self.disk.put(key, tile.tobytes())
+
+    def _remember(self, key: str, tile: Image.Image) -> None:
+        size = self._size(tile)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._tiles:
+                return
+            self._tiles[key] = tile
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, old = self._tiles.popitem(last=False)
+                self._bytes -= self._size(old)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "tiles": len(self._tiles), "bytes": self._bytes}
+
+
+# A card tile is ~3.2 MB in memory, so the default holds about four sheets:
+# enough for the sheets in flight and repeated cards, while a large deck of
+# distinct cards no longer leaves hundreds of MB allocated after it is done.
+TILE_CACHE = TileCache(
+    max_bytes=int(os.environ.get("PROXYFORGE_TILE_CACHE_MB", 96)) * 1024 ** 2,
+    disk=(ImageStore(os.environ["PROXYFORGE_TILE_CACHE_DIR"],
+                     max_bytes=int(os.environ.get("PROXYFORGE_TILE_DISK_MB", 2048)) * 1024 ** 2)
+          if os.environ.get("PROXYFORGE_TILE_CACHE_DIR") else None),
+)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 def _new_page() -> Image.Image:
     """Return a blank white landscape letter page at 300 PPI."""
     return Image.new("RGB", (PAGE_W_PX, PAGE_H_PX), (255, 255, 255))
 
 
-def _draw_reg_marks(page: Image.Image) -> None:
+def _reg_mark_rects() -> list[tuple[int, int, int, int]]:
     """
-    Draw Silhouette Type-1 3-point registration marks onto the page.
+    Silhouette Type-1 3-point registration marks as inclusive pixel rects
+    (x0, y0, x1, y1), shared by the raster and embedded PDF backends.
       - Top-left:    filled black square
       - Top-right:   L-shape (open toward bottom-right)
       - Bottom-left: L-shape (open toward top-right)
     """
-    draw = ImageDraw.Draw(page)
     i = REG_INSET_PX
     s = REG_SIZE_PX
     t = REG_THICK_PX
     W, H = PAGE_W_PX, PAGE_H_PX
-
-    # Top-left: filled square
-    draw.rectangle([i, i, i + s, i + s], fill=(0, 0, 0))
-
-    # Top-right: L (top bar + left vertical)
     tr_x, tr_y = W - i - s, i
-    draw.rectangle([tr_x, tr_y, tr_x + s, tr_y + t], fill=(0, 0, 0))  # horizontal
-    draw.rectangle([tr_x + s - t, tr_y, tr_x + s, tr_y + s], fill=(0, 0, 0))  # vertical
-
-    # Bottom-left: L (bottom bar + right vertical)
     bl_x, bl_y = i, H - i - s
-    draw.rectangle([bl_x, bl_y + s - t, bl_x + s, bl_y + s], fill=(0, 0, 0))  # horizontal
-    draw.rectangle([bl_x, bl_y, bl_x + t, bl_y + s], fill=(0, 0, 0))          # vertical
+    return [
+        # Top-left: filled square
+        (i, i, i + s, i + s),
+        # Top-right: L (top bar + left vertical)
+        (tr_x, tr_y, tr_x + s, tr_y + t),          # horizontal
+        (tr_x + s - t, tr_y, tr_x + s, tr_y + s),  # vertical
+        # Bottom-left: L (bottom bar + right vertical)
+        (bl_x, bl_y + s - t, bl_x + s, bl_y + s),  # horizontal
+        (bl_x, bl_y, bl_x + t, bl_y + s),          # vertical
+    ]
+
+
+def _draw_reg_marks(page: Image.Image) -> None:
+    """Draw Silhouette Type-1 3-point registration marks onto the page."""
+    draw = ImageDraw.Draw(page)
+    for rect in _reg_mark_rects():
+        draw.rectangle(rect, fill=(0, 0, 0))
 
 
 def _card_top_left(index: int) -> tuple[int, int]:
@@ -107,67 +244,251 @@ def _card_top_left(index: int) -> tuple[int, int]:
     return x, y
 
 
-def _place_card(page: Image.Image, img_bytes: bytes,
+def _source_digest(src: ImageSource) -> str:
+    return src.name if isinstance(src, Path) else content_hash(src)
+
+
+def _card_tile(src: ImageSource, extend_corners: int = 0) -> Image.Image | None:
+    """
+    Return the decoded, resized RGB tile for a card image, via TILE_CACHE.
+    Returns None if the image cannot be decoded.
+    """
+    ec   = max(0, extend_corners)
+    size = (CARD_W_PX + ec * 2, CARD_H_PX + ec * 2)
+    key  = TileCache.key(_source_digest(src), ec)
+
+    tile = TILE_CACHE.get(key, size)
+    if tile is not None:
+        return tile
+    with stage("decode"):
+        try:
+            with Image.open(src if isinstance(src, Path) else BytesIO(src)) as im:
+                tile = im.convert("RGB")
+        except Exception:
+            return None
+        tile = tile.resize(size, Image.LANCZOS)
+    TILE_CACHE.put(key, tile)
+    return tile
+
+
+def _place_card(page: Image.Image, img_bytes: ImageSource,
                 x: int, y: int, extend_corners: int = 0) -> None:
     """
-    Decode card image bytes and paste onto the page at (x, y).
+    Paste the cached tile for a card image onto the page at (x, y).
 
     If extend_corners > 0, the image is resized to fill an expanded bounding
     box (card slot + ec px on each side) and pasted offset by -ec so it bleeds
     slightly outside its slot boundary, eliminating the white-corner artifact
     from rounded card art.
     """
-    try:
-        card = Image.open(BytesIO(img_bytes)).convert("RGB")
-    except Exception:
+    card = _card_tile(img_bytes, extend_corners)
+    if card is None:
         placeholder = Image.new("RGB", (CARD_W_PX, CARD_H_PX), (38, 38, 51))
         page.paste(placeholder, (x, y))
         return
 
-    if extend_corners > 0:
-        ec = extend_corners
-        expanded_w = CARD_W_PX + ec * 2
-        expanded_h = CARD_H_PX + ec * 2
-        card = card.resize((expanded_w, expanded_h), Image.LANCZOS)
-        paste_x = x - ec
-        paste_y = y - ec
-    else:
-        card = card.resize((CARD_W_PX, CARD_H_PX), Image.LANCZOS)
-        paste_x, paste_y = x, y
-
-    page.paste(card, (paste_x, paste_y))
-
-
-def _add_label(page: Image.Image, text: str) -> None:
-    """Stamp a small grey label centered in the bottom margin."""
-    draw = ImageDraw.Draw(page)
-    w = draw.textlength(text)
-    x = (PAGE_W_PX - w) // 2
-    y = PAGE_H_PX - REG_INSET_PX + (REG_INSET_PX // 2)
-    draw.text((x, y), text, fill=(160, 160, 160))
+    ec = max(0, extend_corners)
+    page.paste(card, (x - ec, y - ec))
 
 
 def _page_to_jpeg(page: Image.Image, quality: int = 90) -> bytes:
-    """Encode a PIL Image as JPEG bytes for img2pdf."""
-    buf = BytesIO()
-    page.save(buf, format="JPEG", quality=quality, dpi=(PPI, PPI))
+    """Encode a PIL Image as JPEG bytes for a DCTDecode image XObject."""
+    with stage("encode") as timed:
+        buf = BytesIO()
+        page.save(buf, format="JPEG", quality=quality, dpi=(PPI, PPI))
+        timed.bytes = buf.tell()
     buf.seek(0)
     return buf.read()
 
 
+def _sheet_slots(page_num: int, total: int) -> tuple[int, int]:
+    """Return (start index, filled slot count) for sheet [page_num]."""
+    start = page_num * CARDS_PER_PAGE
+    return start, min(start + CARDS_PER_PAGE, total) - start
+
+
+def _sheet_label(page_num: int, is_back: bool, notes: list[str] | None = None) -> str:
+    side  = "back " if is_back else "front"
+    label = f"ProxyForge | Page {page_num + 1} {side} | Print at 100% scale, no fit-to-page"
+    if notes and page_num < len(notes) and notes[page_num]:
+        label += f" | {notes[page_num]}"
+    return label
+
+
+_NOTE_MAX_CHARS = 40
+
+
+def _ellipsize(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+def deck_notes(decks: list[tuple[str, int]]) -> list[str]:
+    """
+    Per-sheet label notes for several decks packed back to back: for each
+    sheet, which front slots (1-based, reading order) hold which deck, e.g.
+    "Atraxa 1-5, Krenko 6-8". `decks` is (label, card count) in print order;
+    long labels are shortened so that a full sheet of decks still fits.
+    """
+    ranges, start = [], 0
+    for label, count in decks:
+        ranges.append((_ellipsize(label.encode("ascii", "replace").decode(), _NOTE_MAX_CHARS),
+                       start, start + count))
+        start += count
+    notes = []
+    for page_num in range((start + CARDS_PER_PAGE - 1) // CARDS_PER_PAGE):
+        lo, hi = page_num * CARDS_PER_PAGE, min(start, (page_num + 1) * CARDS_PER_PAGE)
+        parts = []
+        for label, a, b in ranges:
+            if a < hi and b > lo:
+                first, last = max(a, lo) - lo + 1, min(b, hi) - lo
+                parts.append(f"{label} {first}" if first == last else f"{label} {first}-{last}")
+        notes.append(", ".join(parts))
+    return notes
+
+
+def _sheet_cards(page_num: int, is_back: bool,
+                 front_images: list[ImageSource],
+                 back_images: list[ImageSource | None],
+                 generic_back: ImageSource | None) -> list[tuple[int, ImageSource]]:
+    """
+    Return (slot index, image) pairs for one side of sheet [page_num].
+    Back slots are mirrored by column so they align once the sheet is
+    flipped; cards without a back image and no generic_back are skipped.
+    """
+    start, slots = _sheet_slots(page_num, len(front_images))
+    if not is_back:
+        return [(i, front_images[start + i]) for i in range(slots)]
+
+    placed = []
+    for i in range(slots):
+        # Mirror column so backs align after the sheet is flipped
+        col          = i % COLS
+        row          = i // COLS
+        mirrored_col = COLS - 1 - col
+        mirrored_i   = row * COLS + mirrored_col
+
+        back_bytes = (
+            back_images[start + i]
+            if back_images and back_images[start + i] is not None
+            else generic_back
+        )
+        if back_bytes:
+            placed.append((mirrored_i, back_bytes))
+    return placed
+
+
+# ── Page planning ────────────────────────────────────────────────────────────
+BACKS_MODES = ("auto", "all", "none")
+
+
+class Sheet(NamedTuple):
+    """One output page: a side of physical sheet [page_num] and its placements."""
+    page_num: int
+    is_back:  bool
+    cards:    list[tuple[int, ImageSource]]
+    key:      tuple      # sheets with equal keys render to identical pixels
+
+
+def _placement_key(cards: list[tuple[int, ImageSource]]) -> tuple:
+    return tuple((slot, _source_digest(src)) for slot, src in cards)
+
+
+def plan_sheets(front_images:  list[ImageSource],
+                back_images:   list[ImageSource | None],
+                generic_back:  ImageSource | None = None,
+                backs:         str = "auto",
+                group_flips:   bool = False) -> list[Sheet]:
+    """
+    Decide every output page, in order, before anything is rendered.
+
+    backs       : "all"  - a back after every front, blank or not (duplex
+                           printing stays aligned for any deck)
+                  "none" - fronts only
+                  "auto" - like "all", except that no backs are emitted at
+                           all when none of them would hold a card
+    group_flips : Without a generic_back, move cards with their own back
+                  to the end of the deck. With backs="auto", sheets with
+                  nothing on the back then come first, front only, followed
+                  by a duplex section of the sheets that need their backs.
+    """
+    if backs not in BACKS_MODES:
+        raise ValueError(f"backs must be one of {BACKS_MODES}, not {backs!r}")
+    if group_flips and generic_back is None and back_images:
+        order = sorted(range(len(front_images)), key=lambda i: back_images[i] is not None)
+        front_images = [front_images[i] for i in order]
+        back_images  = [back_images[i] for i in order]
+
+    num_pages = (len(front_images) + CARDS_PER_PAGE - 1) // CARDS_PER_PAGE
+    sides = [(_sheet_cards(p, False, front_images, back_images, generic_back),
+              _sheet_cards(p, True, front_images, back_images, generic_back))
+             for p in range(num_pages)]
+    any_backs = any(back for _, back in sides)
+
+    plan = []
+    for page_num, (front, back) in enumerate(sides):
+        plan.append(Sheet(page_num, False, front, _placement_key(front)))
+        if backs == "none":
+            continue
+        # "auto": grouped flips need backs only from the first sheet that
+        # has one; otherwise every back is kept once any has content.
+        if backs == "auto" and not (back if group_flips else any_backs):
+            continue
+        plan.append(Sheet(page_num, True, back, _placement_key(back)))
+    return plan
+
+
+def _render_sheet(sheet: Sheet, extend_corners: int, quality: int) -> bytes:
+    """Compose and JPEG-encode one sheet side (reg marks and cards, no label)."""
+    page = _new_page()
+    _draw_reg_marks(page)
+
+    for slot, src in sheet.cards:
+        x, y = _card_top_left(slot)
+        _place_card(page, src, x, y, extend_corners)
+
+    SHEETS_RENDERED.inc(backend="raster")
+    return _page_to_jpeg(page, quality)
+
+
+def _unique_sheets(plan: list[Sheet]) -> list[Sheet]:
+    """The first sheet of each distinct key, in plan order."""
+    first: dict[tuple, Sheet] = {}
+    for sheet in plan:
+        first.setdefault(sheet.key, sheet)
+    return list(first.values())
+
+
+def _map_sheets(render: Callable, jobs: list, workers: int | None) -> Iterator:
+    """
+    render(job) for every job in order, on _RENDER_POOL in windows of at
+    most `workers` jobs, so one request cannot queue its whole deck ahead
+    of the others.
+    """
+    render  = bind(render)
+    workers = max(1, min(workers or RENDER_WORKERS, RENDER_WORKERS))
+    for start in range(0, len(jobs), workers):
+        yield from _RENDER_POOL.map(render, jobs[start:start + workers])
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 def build_pdf(
-    front_images:   list[bytes],
-    back_images:    list[bytes | None],
-    generic_back:   bytes | None = None,
+    front_images:   list[ImageSource],
+    back_images:    list[ImageSource | None],
+    generic_back:   ImageSource | None = None,
     extend_corners: int = 6,  # Default to 0.5mm bleed (6px)
     quality:        int = 90,
     paper_size:     str = "letter",   # reserved for future multi-size support
+    workers:        int | None = None,
+    backend:        str = "raster",
+    notes:          list[str] | None = None,
+    backs:          str = "auto",
+    group_flips:    bool = False,
 ) -> bytes:
     """
     Build a Silhouette-ready print-and-cut PDF.
 
     Pages alternate: front sheet → back sheet → front sheet → back sheet …
+    (see plan_sheets for when back sheets are left out)
 
     Front page : cards in normal reading order (left→right, top→bottom).
     Back page  : cards mirrored horizontally so they align when the sheet is
@@ -175,7 +496,8 @@ def build_pdf(
 
     Parameters
     ----------
-    front_images    : Ordered list of raw front image bytes, one per card.
+    front_images    : Ordered list of raw front image bytes (or ImageStore
+                      blob paths), one per card.
     back_images     : Matching list of back image bytes; use None for slots
                       that should fall back to generic_back.
     generic_back    : Fallback back image for any None entry in back_images.
@@ -183,62 +505,360 @@ def build_pdf(
                       Recommended value: 10.
     quality         : JPEG compression quality (0–100). Higher = larger file.
     paper_size      : Reserved. Currently only "letter" (landscape) supported.
+    workers         : Sheets rendered in parallel, at most RENDER_WORKERS
+                      (the shared render pool's size, the default); 1
+                      renders one sheet at a time.
+    backend         : "raster" composites each sheet with Pillow into one
+                      full-page JPEG. "embed" stores each
+                      distinct card image once and places it per slot, with
+                      vector reg marks and labels — far smaller and faster
+                      for decks with repeated cards.
+    notes           : Optional text appended to each sheet's label, indexed
+                      by sheet (see deck_notes; assumes group_flips=False).
+    backs           : "auto", "all" or "none" — see plan_sheets.
+    group_flips     : Move cards with their own back into a trailing duplex
+                      section — see plan_sheets.
 
     Returns
     -------
     PDF as bytes.
     """
-    total     = len(front_images)
-    num_pages = (total + CARDS_PER_PAGE - 1) // CARDS_PER_PAGE
-
-    jpeg_pages: list[bytes] = []
-
-    for page_num in range(num_pages):
-        start = page_num * CARDS_PER_PAGE
-        end   = min(start + CARDS_PER_PAGE, total)
-        slots = end - start
-
-        # ── Front page ───────────────────────────────────────────────────────
-        front_pg = _new_page()
-        _draw_reg_marks(front_pg)
-
-        for i in range(slots):
-            x, y = _card_top_left(i)
-            _place_card(front_pg, front_images[start + i], x, y, extend_corners)
-
-        _add_label(front_pg,
-                   f"ProxyForge | Page {page_num + 1} front | "
-                   "Print at 100% scale, no fit-to-page")
-        jpeg_pages.append(_page_to_jpeg(front_pg, quality))
-
-        # ── Back page ────────────────────────────────────────────────────────
-        back_pg = _new_page()
-        _draw_reg_marks(back_pg)
-
-        for i in range(slots):
-            # Mirror column so backs align after the sheet is flipped
-            col          = i % COLS
-            row          = i // COLS
-            mirrored_col = COLS - 1 - col
-            mirrored_i   = row * COLS + mirrored_col
-
-            back_bytes = (
-                back_images[start + i]
-                if back_images and back_images[start + i] is not None
-                else generic_back
-            )
-
-            if back_bytes:
-                x, y = _card_top_left(mirrored_i)
-                _place_card(back_pg, back_bytes, x, y, extend_corners)
-
-        _add_label(back_pg,
-                   f"ProxyForge | Page {page_num + 1} back  | "
-                   "Print at 100% scale, no fit-to-page")
-        jpeg_pages.append(_page_to_jpeg(back_pg, quality))
-
-    # ── Pack JPEG pages into a PDF via img2pdf (no re-encoding) ──────────────
-    layout = img2pdf.get_layout_fun(
-        (img2pdf.in_to_pt(11), img2pdf.in_to_pt(8.5))  # landscape letter
-    )
-    return img2pdf.convert(jpeg_pages, layout_fun=layout)
+    return b"".join(iter_pdf(front_images, back_images, generic_back, extend_corners,
+                             quality, paper_size, workers, backend, notes=notes,
+                             backs=backs, group_flips=group_flips))
+
+
+# ── Streaming output ─────────────────────────────────────────────────────────
+class _PdfStream:
+    """
+    Minimal incremental PDF writer. Objects are emitted as they are produced;
+    the page tree, catalog and xref table follow the last page. Image
+    XObjects are written once and may be referenced from any later page.
+    """
+
+    _CATALOG, _PAGES = 1, 2
+
+    def __init__(self, page_w_pt: float, page_h_pt: float):
+        self.page_w_pt = page_w_pt
+        self.page_h_pt = page_h_pt
+        self.offset    = 0
+        self.xref: dict[int, int] = {}
+        self.page_ids: list[int]  = []
+        self.font_id: int | None  = None
+        self.next_id   = 3
+
+    def _emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    def _obj(self, num: int, body: str, stream: bytes | None = None) -> bytes:
+        self.xref[num] = self.offset
+        out = f"{num} 0 obj\n{body}\n".encode()
+        if stream is not None:
+            out += b"stream\n" + stream + b"\nendstream\n"
+        return self._emit(out + b"endobj\n")
+
+    def _alloc(self) -> int:
+        self.next_id += 1
+        return self.next_id - 1
+
+    def header(self) -> bytes:
+        return self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def image(self, jpeg: bytes, w_px: int, h_px: int, gray: bool = False) -> tuple[int, bytes]:
+        """Write a JPEG as an image XObject; return (object id, bytes)."""
+        img_id = self._alloc()
+        space  = "/DeviceGray" if gray else "/DeviceRGB"
+        return img_id, self._obj(
+            img_id,
+            f"<< /Type /XObject /Subtype /Image /Width {w_px} /Height {h_px} "
+            f"/ColorSpace {space} /BitsPerComponent 8 /Filter /DCTDecode "
+            f"/Length {len(jpeg)} >>", jpeg)
+
+    def font(self) -> tuple[int, bytes]:
+        """The standard-14 Courier font, written on first use."""
+        if self.font_id is not None:
+            return self.font_id, b""
+        self.font_id = self._alloc()
+        return self.font_id, self._obj(
+            self.font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>")
+
+    def page(self, content: bytes, xobjects: dict[str, int], font_id: int | None = None) -> bytes:
+        """Write a page drawing `content` with the named image XObjects."""
+        content_id, page_id = self._alloc(), self._alloc()
+        self.page_ids.append(page_id)
+        xobj  = " ".join(f"/{name} {num} 0 R" for name, num in xobjects.items())
+        fonts = f" /Font << /F1 {font_id} 0 R >>" if font_id is not None else ""
+        return (
+            self._obj(content_id, f"<< /Length {len(content)} >>", content)
+            + self._obj(page_id,
+                        f"<< /Type /Page /Parent {self._PAGES} 0 R "
+                        f"/MediaBox [0 0 {self.page_w_pt:.4f} {self.page_h_pt:.4f}] "
+                        f"/Resources << /XObject << {xobj} >>{fonts} >> "
+                        f"/Contents {content_id} 0 R >>")
+        )
+
+    def trailer(self) -> bytes:
+        kids = " ".join(f"{p} 0 R" for p in self.page_ids)
+        out  = self._obj(self._PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")
+        out += self._obj(self._CATALOG, f"<< /Type /Catalog /Pages {self._PAGES} 0 R >>")
+        xref_at = self.offset
+        size    = self.next_id
+        lines   = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        lines  += [f"{self.xref[n]:010d} 00000 n \n" for n in range(1, size)]
+        lines.append(f"trailer\n<< /Size {size} /Root {self._CATALOG} 0 R >>\n"
+                     f"startxref\n{xref_at}\n%%EOF\n")
+        return out + self._emit("".join(lines).encode())
+
+
+# ── Embedded backend ─────────────────────────────────────────────────────────
+# Instead of rasterising whole sheets, each distinct card image is embedded
+# once as an image XObject and placed in every slot by a transform matrix;
+# registration marks and labels are vector operators. Geometry is the same
+# pixel grid as the raster backend, converted at 72/PPI pt per px.
+_PT = 72 / PPI
+_LABEL_FONT_PX = 10   # Courier is 0.6 em per glyph → 6 px/char, like Pillow's default font
+# Labels stay between the registration marks' insets; longer ones are cut short.
+_LABEL_MAX_CHARS = int((PAGE_W_PX - 2 * REG_INSET_PX) / (_LABEL_FONT_PX * 0.6))
+
+
+def _embed_jpeg(src: ImageSource, quality: int) -> tuple[bytes, int, int, bool] | None:
+    """
+    Return (jpeg bytes, width, height, is_gray) ready for a DCTDecode XObject.
+    Baseline RGB/greyscale JPEGs are passed through untouched; anything else
+    (Scryfall PNGs, CMYK JPEGs) is converted to RGB and encoded at `quality`.
+    Returns None if the image cannot be decoded.
+    """
+    try:
+        with Image.open(src if isinstance(src, Path) else BytesIO(src)) as im:
+            w, h = im.size
+            if im.format == "JPEG" and im.mode in ("RGB", "L"):
+                raw = src.read_bytes() if isinstance(src, Path) else src
+                return raw, w, h, im.mode == "L"
+            with stage("embed") as timed:
+                buf = BytesIO()
+                im.convert("RGB").save(buf, format="JPEG", quality=quality)
+                timed.bytes = buf.tell()
+            return buf.getvalue(), w, h, False
+    except Exception:
+        return None
+
+
+def _pdf_rect(x0: float, y0: float, w: float, h: float) -> str:
+    """`re` operator for a px rect given top-left origin, in PDF pt space."""
+    return f"{x0 * _PT:.3f} {(PAGE_H_PX - y0 - h) * _PT:.3f} {w * _PT:.3f} {h * _PT:.3f} re"
+
+
+def _pdf_text(text: str) -> str:
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def _vector_sheet(placements: list[tuple[int, str | None]], label: str,
+                  extend_corners: int) -> bytes:
+    """
+    Content stream for one sheet side: reg marks, card placements (XObject
+    name, or None for an undecodable image's placeholder) and the label.
+    """
+    ops = ["0 g"]
+    # PIL rectangles are inclusive of both corners, hence the +1.
+    ops += [_pdf_rect(x0, y0, x1 - x0 + 1, y1 - y0 + 1) + " f"
+            for x0, y0, x1, y1 in _reg_mark_rects()]
+
+    ec = max(0, extend_corners)
+    for slot, name in placements:
+        x, y = _card_top_left(slot)
+        if name is None:
+            ops.append(f"q 0.149 0.149 0.2 rg {_pdf_rect(x, y, CARD_W_PX, CARD_H_PX)} f Q")
+            continue
+        w, h = CARD_W_PX + ec * 2, CARD_H_PX + ec * 2
+        bx, by = x - ec, PAGE_H_PX - (y - ec) - h
+        ops.append(f"q {w * _PT:.3f} 0 0 {h * _PT:.3f} {bx * _PT:.3f} {by * _PT:.3f} cm /{name} Do Q")
+
+    ops.append(_pdf_label(label))
+    return "\n".join(ops).encode()
+
+
+def _pdf_label(label: str) -> str:
+    """Small grey label centred in the bottom margin, as text operators."""
+    label   = _ellipsize(label, _LABEL_MAX_CHARS)
+    size_pt = _LABEL_FONT_PX * _PT
+    text_w  = len(label) * _LABEL_FONT_PX * 0.6
+    lx = (PAGE_W_PX - text_w) // 2
+    ly = PAGE_H_PX - REG_INSET_PX + (REG_INSET_PX // 2) + _LABEL_FONT_PX * 0.8   # baseline
+    return (f"BT /F1 {size_pt:.3f} Tf 0.627 g {lx * _PT:.3f} {(PAGE_H_PX - ly) * _PT:.3f} Td "
+            f"{_pdf_text(label)} Tj ET")
+
+
+def _iter_embedded_pdf(plan: list[Sheet], extend_corners, quality, workers,
+                       on_sheet=None, notes=None) -> Iterator[bytes]:
+    writer = _PdfStream(PAGE_W_PX * _PT, PAGE_H_PX * _PT)
+    yield writer.header()
+    font_id, out = writer.font()
+    yield out
+
+    embedded: dict[str, str | None] = {}   # content digest → XObject name (None = undecodable)
+    names: dict[str, int] = {}             # XObject name → object id
+
+    def prepare(src):
+        return _embed_jpeg(src, quality)
+
+    for done, sheet in enumerate(plan, 1):
+        cards = sheet.cards
+
+        # Embed the images this sheet introduces, converting them in parallel.
+        new = {}
+        for _, src in cards:
+            new.setdefault(_source_digest(src), src)
+        new = {d: src for d, src in new.items() if d not in embedded}
+        for digest, prepared in zip(new, _map_sheets(prepare, list(new.values()), workers)):
+            if prepared is None:
+                embedded[digest] = None
+                continue
+            jpeg, w, h, gray = prepared
+            img_id, out = writer.image(jpeg, w, h, gray)
+            name = f"Im{len(names)}"
+            embedded[digest], names[name] = name, img_id
+            yield out
+
+        placements = [(slot, embedded[_source_digest(src)]) for slot, src in cards]
+        used = {n: names[n] for _, n in placements if n is not None}
+        content = _vector_sheet(placements, _sheet_label(sheet.page_num, sheet.is_back, notes),
+                                extend_corners)
+        yield writer.page(content, used, font_id)
+        SHEETS_RENDERED.inc(backend="embed")
+        if on_sheet:
+            on_sheet(done, len(plan))
+
+    yield writer.trailer()
+
+
+def iter_pdf(
+    front_images:   list[ImageSource],
+    back_images:    list[ImageSource | None],
+    generic_back:   ImageSource | None = None,
+    extend_corners: int = 6,
+    quality:        int = 90,
+    paper_size:     str = "letter",
+    workers:        int | None = None,
+    backend:        str = "raster",
+    on_sheet:       Callable[[int, int], None] | None = None,
+    notes:          list[str] | None = None,
+    backs:          str = "auto",
+    group_flips:    bool = False,
+) -> Iterator[bytes]:
+    """
+    Streaming counterpart of build_pdf: same sheets, same order, yielded as
+    PDF byte chunks as each sheet finishes encoding. Suitable for a chunked
+    StreamingResponse; memory stays bounded by the render window.
+    on_sheet(done, total) is called after each page is written.
+    """
+    plan = plan_sheets(front_images, back_images, generic_back, backs, group_flips)
+    if backend == "embed":
+        yield from _iter_embedded_pdf(plan, extend_corners, quality, workers, on_sheet, notes)
+        return
+    if backend != "raster":
+        raise ValueError(f"Unknown PDF backend: {backend!r}")
+
+    writer = _PdfStream(PAGE_W_PX * _PT, PAGE_H_PX * _PT)
+    yield writer.header()
+    font_id, out = writer.font()
+    yield out
+
+    # Each distinct sheet is rendered once, in order of first use; later
+    # identical sheets reuse its image XObject under their own label.
+    rendered = _map_sheets(lambda sheet: _render_sheet(sheet, extend_corners, quality),
+                           _unique_sheets(plan), workers)
+    images: dict[tuple, int] = {}
+    full_page = f"q {writer.page_w_pt:.4f} 0 0 {writer.page_h_pt:.4f} 0 0 cm /Im0 Do Q"
+    for done, sheet in enumerate(plan, 1):
+        if sheet.key not in images:
+            images[sheet.key], out = writer.image(next(rendered), PAGE_W_PX, PAGE_H_PX)
+            yield out
+        label = _sheet_label(sheet.page_num, sheet.is_back, notes)
+        yield writer.page(f"{full_page}\n{_pdf_label(label)}".encode(),
+                          {"Im0": images[sheet.key]}, font_id)
+        if on_sheet:
+            on_sheet(done, len(plan))
+    yield writer.trailer()
+
+
+# ── Preview ──────────────────────────────────────────────────────────────────
+PREVIEW_SCALE = 0.2   # 660 × 510 px sheets, 60 PPI
+
+
+def _preview_tile(src: ImageSource, size: tuple[int, int]) -> Image.Image | None:
+    """Small card tile, decoded at reduced scale where the format allows."""
+    key  = TileCache.key(_source_digest(src), 0, size)
+    tile = TILE_CACHE.get(key, size)
+    if tile is not None:
+        return tile
+    with stage("decode"):
+        try:
+            with Image.open(src if isinstance(src, Path) else BytesIO(src)) as im:
+                im.draft("RGB", size)   # JPEG: decode at 1/2, 1/4 or 1/8 scale
+                tile = im.convert("RGB").resize(size, Image.BILINEAR)
+        except Exception:
+            return None
+    TILE_CACHE.put(key, tile)
+    return tile
+
+
+def _render_preview(sheet: Sheet, extend_corners: int, scale: float, fmt: str) -> bytes:
+    """One sheet side laid out exactly like _render_sheet, scaled down."""
+    def px(v: float) -> int:
+        return round(v * scale)
+
+    page = Image.new("RGB", (px(PAGE_W_PX), px(PAGE_H_PX)), (255, 255, 255))
+    draw = ImageDraw.Draw(page)
+    for x0, y0, x1, y1 in _reg_mark_rects():
+        draw.rectangle((px(x0), px(y0), px(x1), px(y1)), fill=(0, 0, 0))
+
+    ec   = max(0, extend_corners)
+    size = (px(CARD_W_PX + ec * 2), px(CARD_H_PX + ec * 2))
+    for slot, src in sheet.cards:
+        x, y = _card_top_left(slot)
+        tile = _preview_tile(src, size)
+        if tile is None:
+            draw.rectangle((px(x), px(y), px(x + CARD_W_PX) - 1, px(y + CARD_H_PX) - 1),
+                           fill=(38, 38, 51))
+        else:
+            page.paste(tile, (px(x - ec), px(y - ec)))
+
+    SHEETS_RENDERED.inc(backend="preview")
+    with stage("encode") as timed:
+        buf = BytesIO()
+        if fmt == "webp":
+            page.save(buf, format="WEBP", quality=75, method=0)
+        else:
+            page.save(buf, format="PNG", compress_level=1)
+        timed.bytes = buf.tell()
+    return buf.getvalue()
+
+
+def iter_preview(
+    front_images:   list[ImageSource],
+    back_images:    list[ImageSource | None],
+    generic_back:   ImageSource | None = None,
+    extend_corners: int = 6,
+    scale:          float = PREVIEW_SCALE,
+    fmt:            str = "webp",
+    workers:        int | None = None,
+    backs:          str = "auto",
+    group_flips:    bool = False,
+) -> Iterator[tuple[int, bool, bytes]]:
+    """
+    Yield (page_num, is_back, image bytes) for every page, in the same order
+    and layout as build_pdf (grid, mirrored backs, reg marks) but at `scale`
+    of the print resolution. fmt is "webp" or "png".
+    """
+    if fmt not in ("webp", "png"):
+        raise ValueError(f"Unknown preview format: {fmt!r}")
+
+    plan     = plan_sheets(front_images, back_images, generic_back, backs, group_flips)
+    rendered = _map_sheets(lambda sheet: _render_preview(sheet, extend_corners, scale, fmt),
+                           _unique_sheets(plan), workers)
+    images: dict[tuple, bytes] = {}
+    for sheet in plan:
+        if sheet.key not in images:
+            images[sheet.key] = next(rendered)
+        yield sheet.page_num, sheet.is_back, images[sheet.key]
@@ -0,0 +1,259 @@
+"""
+result_cache.py - ProxyForge finished-artifact cache
+
+Keeps finished PDFs and ZIPs on local disk so regenerating the same deck
+(after a failed print, on another machine, from a shared link) is a file
+send instead of a full lookup, download and render:
+
+  - Entries are addressed by a caller-built key (see main.result_key: the
+    canonical deck, generic back hash and render options) and carry a
+    `version`, a digest of the card data the artifact was built from. A
+    lookup with a different version is a miss, so an entry never outlives
+    the metadata or images behind it
+  - Each entry is an artifact file plus a small JSON sidecar (media type,
+    summary, report); the artifact is named after key and version, so a
+    rebuild never overwrites a file that may still be being sent
+  - Artifacts are written to a temp name and os.replace()d into place;
+    reads bump their mtime, and eviction removes the least recently used
+    until the cache is back under its byte budget, along with temp files
+    a crashed or killed writer left behind
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+DEFAULT_MAX_BYTES = 1024 ** 3
+_EVICT_SLACK      = 0.9     # evict down to 90% of the budget
+_TOUCH_INTERVAL   = 60      # seconds between mtime bumps for the same artifact
+_TMP_MAX_AGE      = 3600    # seconds without a write before a temp file is abandoned
+
+
+def digest(*parts) -> str:
+    """Stable sha256 of JSON-serialisable parts, for keys and versions."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class CachedResult(NamedTuple):
+    path: Path
+    etag: str
+    meta: dict
+
+
+class PendingResult:
+    """
+    An artifact being written; see ResultCache.open. The temp file is only
+    created on entering the with-block, so a response whose body is never
+    sent leaves nothing behind. Stored on a clean exit from the block unless
+    discard() was called, dropped otherwise.
+    """
+
+    def __init__(self, cache: "ResultCache", key: str, version: str, meta: dict):
+        self.cache, self.key, self.version, self.meta = cache, key, version, meta
+        self.discarded = False
+        self.file = None
+
+    def write(self, data: bytes) -> int:
+        return self.file.write(data) if self.file else len(data)
+
+    def discard(self) -> None:
+        self.discarded = True
+
+    def __enter__(self) -> "PendingResult":
+        try:
+            self.cache.root.mkdir(parents=True, exist_ok=True)
+            fd, self.tmp = tempfile.mkstemp(dir=self.cache.root, prefix=".tmp-")
+            self.file = os.fdopen(fd, "wb")
+        except OSError:
+            self.cache._count("errors")   # unwritable: pass the stream through uncached
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.file is None:
+            return
+        self.file.close()
+        try:
+            if exc_type is None and not self.discarded:
+                self.cache._commit(self.key, self.version, Path(self.tmp), self.meta)
+        finally:
+            try:
+                os.unlink(self.tmp)
+            except OSError:
+                pass
+
+
+class ResultCache:
+    """Bounded, LRU-evicted, multi-process cache of finished print artifacts."""
+
+    def __init__(self, root: str | Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root      = Path(root)
+        self.max_bytes = max_bytes
+        self._lock     = threading.Lock()
+        self._written  = 0
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "stores": 0,
+                          "evictions": 0, "bytes_served": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    # ── Paths ────────────────────────────────────────────────────────────────
+    def _meta_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _artifact_path(self, key: str, version: str) -> Path:
+        return self.root / key[:2] / f"{key}-{version[:16]}"
+
+    @staticmethod
+    def etag(key: str, version: str) -> str:
+        return f'"{key[:16]}{version[:16]}"'
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    # ── Public API ───────────────────────────────────────────────────────────
+    def get(self, key: str, version: str) -> CachedResult | None:
+        """The stored artifact for `key` if it was built from `version`."""
+        if not self.enabled:
+            return None
+        try:
+            meta = json.loads(self._meta_path(key).read_text())
+        except (OSError, ValueError):
+            self._count("misses")
+            return None
+        if meta.get("version") != version:
+            self._count("stale")
+            return None
+        path = self._artifact_path(key, version)
+        try:
+            st = path.stat()
+        except OSError:
+            self._count("misses")
+            return None
+        if time.time() - st.st_mtime > _TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        self._count("hits")
+        self._count("bytes_served", st.st_size)
+        return CachedResult(path, self.etag(key, version), meta)
+
+    def open(self, key: str, version: str, meta: dict | None = None) -> PendingResult | None:
+        """
+        Start writing the artifact for (key, version). Use as a context
+        manager; `meta` may still be filled in before the block ends.
+        Returns None when the cache is disabled.
+        """
+        if not self.enabled:
+            return None
+        return PendingResult(self, key, version, dict(meta or {}))
+
+    def put_file(self, key: str, version: str, src: Path, meta: dict) -> None:
+        """Store a finished artifact file; it is hard-linked where possible."""
+        if not self.enabled:
+            return
+        tmp = self.root / f".tmp-{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}"
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(src, tmp)
+            except OSError:
+                shutil.copyfile(src, tmp)
+            self._commit(key, version, tmp, meta)
+        except OSError:
+            self._count("errors")
+        finally:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def export(self, result: CachedResult, dest: Path) -> None:
+        """Hard-link (or copy) a stored artifact to `dest`; OSError if it is gone."""
+        try:
+            os.link(result.path, dest)
+        except OSError:
+            shutil.copyfile(result.path, dest)
+
+    def _commit(self, key: str, version: str, tmp: Path, meta: dict) -> None:
+        path = self._artifact_path(key, version)
+        try:
+            size = tmp.stat().st_size
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, path)
+            fd, meta_tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump({**meta, "version": version, "created": time.time(), "size": size}, f)
+            os.replace(meta_tmp, self._meta_path(key))
+        except OSError:
+            self._count("errors")
+            return
+        self._count("stores")
+        with self._lock:
+            self._written += size
+            due = self._written >= self.max_bytes * (1 - _EVICT_SLACK)
+            if due:
+                self._written = 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove least recently used artifacts until under the byte budget, and
+        temp files nobody has written to for _TMP_MAX_AGE.
+        """
+        artifacts, total, now = [], 0, time.time()
+        for p in (*self.root.glob(".tmp-*"), *self.root.glob("*/*")):
+            if p.suffix == ".json":
+                continue
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if p.name.startswith(".tmp-"):
+                if now - st.st_mtime > _TMP_MAX_AGE:
+                    try:
+                        p.unlink()
+                    except OSError:
+                        pass
+                continue
+            artifacts.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        target, removed = self.max_bytes * _EVICT_SLACK, 0
+        for _, size, p in sorted(artifacts, key=lambda a: a[0]):
+            if total <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total   -= size
+            removed += 1
+            # Drop the sidecar too unless it already describes a newer build.
+            meta = self._meta_path(p.name.split("-")[0])
+            try:
+                if self._artifact_path(meta.stem, json.loads(meta.read_text())["version"]) == p:
+                    meta.unlink()
+            except (OSError, ValueError, KeyError):
+                pass
+        self._count("evictions", removed)
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._counters)
+        lookups = out["hits"] + out["misses"] + out["stale"]
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+        return out
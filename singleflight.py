@@ -0,0 +1,88 @@
+"""
+singleflight.py - ProxyForge in-process request coalescing
+
+Many requests resolve the same popular cards (Sol Ring, Arcane Signet,
+basics) at the same moment. A SingleFlight makes sure only one of them does
+the work for a given key while the others wait for its outcome:
+
+  - The first caller for a key becomes the leader and runs the call; callers
+    arriving while it is in flight block until it finishes and get the same
+    result, or the same exception
+  - Nothing is remembered once a call completes: caching stays with
+    CardCache / ImageStore, this only collapses concurrent duplicates
+  - begin() / finish() split do() in two for callers that resolve many keys
+    in one round trip (Scryfall's /cards/collection)
+  - Blocking and thread-based, to match the to_thread()-run lookups and
+    downloads it wraps; coalescing is per process, not across workers
+"""
+
+import threading
+from typing import Any, Callable, Hashable
+
+
+class Flight:
+    """One in-flight call; followers wait() on it."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done   = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one."""
+
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._flights: dict[Hashable, Flight] = {}
+        self._counters = {"leaders": 0, "coalesced": 0, "errors": 0}
+
+    def begin(self, key: Hashable) -> tuple[Flight, bool]:
+        """
+        Join the flight for `key`: (flight, True) if the caller leads it and
+        must finish() it, (flight, False) if it should wait() instead.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._counters["coalesced"] += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self._counters["leaders"] += 1
+            return flight, True
+
+    def finish(self, key: Hashable, flight: Flight, result: Any = None,
+               error: BaseException | None = None) -> None:
+        """Publish a led flight's outcome and wake its followers."""
+        flight.result, flight.error = result, error
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if error is not None:
+                self._counters["errors"] += 1
+        flight.done.set()
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """fn(*args, **kwargs), unless a call for `key` is already running."""
+        flight, leader = self.begin(key)
+        if not leader:
+            return flight.wait()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._flights)}
@@ -0,0 +1,101 @@
+"""
+static_page.py - ProxyForge pre-compressed static pages
+
+Serves templates/index.html from memory instead of reading it from disk on
+every request, which matters most on a cold serverless instance:
+
+  - The file is read and gzip-compressed once; precompress() adds a Brotli
+    variant when the optional `brotli` package is installed (it is slow
+    enough at full quality to be left to the background warm-up)
+  - select() picks the smallest variant the client's Accept-Encoding allows;
+    every variant has its own strong ETag, and not_modified() answers
+    If-None-Match so repeat visits get a bodiless 304
+  - A stat() per request notices an edited file and reloads it, so template
+    changes still show up without a restart during development
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:   # optional; gzip covers every browser
+    brotli = None
+
+_PREFERENCE = ("br", "gzip")   # smallest first
+
+
+def accepted_encodings(header: str | None) -> set[str]:
+    """Content codings an Accept-Encoding header allows (q=0 excluded)."""
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticPage:
+    """One file held in memory as identity, gzip and (optionally) br bodies."""
+
+    def __init__(self, path: str | Path, media_type: str = "text/html; charset=utf-8"):
+        self.path       = Path(path)
+        self.media_type = media_type
+        self._lock      = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        st   = os.stat(self.path)
+        body = self.path.read_bytes()
+        tag  = hashlib.sha256(body).hexdigest()[:20]
+        self._stamp = (st.st_mtime_ns, st.st_size)
+        self._tag   = tag
+        self._variants = {None: (body, f'"{tag}"'),
+                          "gzip": (gzip.compress(body, 9, mtime=0), f'"{tag}-gz"')}
+
+    def _fresh(self) -> None:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return   # keep serving what was loaded
+        if (st.st_mtime_ns, st.st_size) != self._stamp:
+            with self._lock:
+                if (st.st_mtime_ns, st.st_size) != self._stamp:
+                    self._load()
+
+    def precompress(self) -> None:
+        """Add the Brotli variant, if brotli is installed."""
+        if brotli is None or "br" in self._variants:
+            return
+        body = brotli.compress(self._variants[None][0], quality=11)
+        with self._lock:
+            self._variants = {**self._variants, "br": (body, f'"{self._tag}-br"')}
+
+    def select(self, accept_encoding: str | None) -> tuple[bytes, dict]:
+        """(body, headers) of the best variant for an Accept-Encoding header."""
+        self._fresh()
+        variants = self._variants
+        accepted = accepted_encodings(accept_encoding)
+        coding   = next((c for c in _PREFERENCE if c in accepted and c in variants), None)
+        body, etag = variants[coding]
+        headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+        if coding:
+            headers["Content-Encoding"] = coding
+        return body, headers
+
+    def not_modified(self, if_none_match: str | None, etag: str) -> bool:
+        """Whether If-None-Match already names this variant."""
+        if not if_none_match:
+            return False
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
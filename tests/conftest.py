@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# main.py reads its configuration at import time: give the whole session
+# throwaway caches and no background warm-up.
+os.environ["PROXYFORGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="proxyforge-tests-")
+os.environ["PROXYFORGE_WARMUP"]    = "0"
+os.environ.pop("PROXYFORGE_BULK_INDEX", None)
+os.environ.pop("PROXYFORGE_TILE_CACHE_DIR", None)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bench"))
+
+
+@pytest.fixture
+def scryfall(monkeypatch):
+    """The bench Scryfall stub with a small synthetic catalog, as main's upstream."""
+    import main
+    from scryfall_stub import serve, synthetic_catalog
+
+    server = serve(cards=synthetic_catalog(singles=1, flips=1))
+    monkeypatch.setattr(main, "SCRYFALL_API", server.base_url)
+    yield server
+    server.shutdown()
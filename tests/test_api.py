@@ -0,0 +1,43 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_report_header_only_when_it_fits():
+    summary = {"ok": 1, "errors": 0}
+    small = main._report_headers(summary, [{"name": "Sol Ring", "status": "ok"}])
+    assert json.loads(small["X-Report"]) == [{"name": "Sol Ring", "status": "ok"}]
+    assert json.loads(small["X-Summary"]) == summary
+
+    big = main._report_headers(summary, [{"name": "Island", "status": "ok"}] * 500)
+    assert "X-Report" not in big
+    assert json.loads(big["X-Summary"]) == {**summary, "report_omitted": True}
+    assert "X-Report" not in big["Access-Control-Expose-Headers"]
+
+
+@pytest.mark.parametrize("path, fields", [
+    ("/api/pdf",     {"deck_list": "1 Island"}),
+    ("/api/jobs",    {"deck_list": "1 Island"}),
+    ("/api/batch",   {"deck_lists": "1 Island"}),
+])
+@pytest.mark.parametrize("bad, detail", [
+    ({"backend": "vector"}, "backend must be"),
+    ({"backs": "sometimes"}, "backs must be"),
+    ({"image_policy": "huge"}, "image_policy"),
+    ({"ppi": "20"}, "ppi must be"),
+])
+def test_print_options_are_validated_alike(path, fields, bad, detail):
+    with TestClient(main.app) as client:
+        r = client.post(path, data={**fields, **bad})
+    assert r.status_code == 400
+    assert detail in r.json()["detail"]
+
+
+def test_preview_validates_backs():
+    with TestClient(main.app) as client:
+        r = client.post("/api/preview", data={"deck_list": "1 Island", "backs": "sometimes"})
+    assert r.status_code == 400
+    assert "backs must be" in r.json()["detail"]
@@ -0,0 +1,67 @@
+"""Offline index: bulk file parsing and the ingest CLI."""
+
+import io
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import bulk_index
+
+REPO = Path(__file__).resolve().parent.parent
+CARDS = [
+    {"object": "card", "id": "a1", "name": "Sol Ring", "set": "cmr", "collector_number": "472",
+     "layout": "normal", "image_uris": {"png": "https://img/a1.png"}},
+    {"object": "card", "id": "b2", "name": "Fire // Ice", "set": "mh2", "collector_number": "290",
+     "layout": "split", "card_faces": [{"name": "Fire"}, {"name": "Ice"}],
+     "image_uris": {"png": "https://img/b2.png"}},
+]
+
+
+def test_cli_ingest_stands_alone(tmp_path):
+    """The CLI builds the index at the default path without importing the web app."""
+    src = tmp_path / "default-cards.json"
+    src.write_text(json.dumps(CARDS))
+    probe = ("import sys, bulk_index; rc = bulk_index.main(['ingest', sys.argv[1]]); "
+             "assert 'main' not in sys.modules and 'fastapi' not in sys.modules, 'imported the app'; "
+             "sys.exit(rc)")
+    env = {**os.environ, "PROXYFORGE_CACHE_DIR": str(tmp_path / "cache")}
+    env.pop("PROXYFORGE_BULK_INDEX", None)
+    proc = subprocess.run([sys.executable, "-c", probe, str(src)], cwd=REPO, env=env,
+                          capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+
+    index = bulk_index.BulkIndex(tmp_path / "cache" / "bulk.sqlite3")
+    assert index.by_id("a1")["name"] == "Sol Ring"
+    assert index.by_print("cmr", "472")["id"] == "a1"
+    assert index.by_name("ice")["id"] == "b2"
+
+
+TRICKY = [
+    {"name": "Fire // Ice", "oracle_text": "Fire deals 2 damage divided as you choose.\nIce"},
+    {"name": "Lim-D\u00fbl's Vault", "flavor_text": "\"]}, {\" is not the end", "path": "C:\\cards\\"},
+    {"name": "Emoji \U0001f600", "faces": [{"name": "A"}, {"name": "B ]"}], "n": 12345},
+    {},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 13, 64, 1 << 20])
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_iter_json_array_across_chunk_boundaries(chunk_size, ensure_ascii):
+    """Chunks may end inside strings, escapes (\\", \\\\, \\uXXXX) and between elements."""
+    text = "[\n" + ",\n".join(json.dumps(c, ensure_ascii=ensure_ascii) for c in TRICKY) + "\n]\n"
+    assert list(bulk_index.iter_json_array(io.StringIO(text), chunk_size)) == TRICKY
+
+
+@pytest.mark.parametrize("text", ["[]", " [ ] ", ""])
+def test_iter_json_array_empty(text):
+    assert list(bulk_index.iter_json_array(io.StringIO(text), 1)) == []
+
+
+def test_iter_json_array_truncated():
+    text = json.dumps(TRICKY)[:-20]
+    with pytest.raises(json.JSONDecodeError):
+        list(bulk_index.iter_json_array(io.StringIO(text), 8))
@@ -0,0 +1,58 @@
+"""Shared card metadata cache: TTLs, negative entries and the size cap."""
+
+import types
+
+import pytest
+
+import card_cache
+from card_cache import CardCache, name_key
+
+SOL_RING = {"object": "card", "id": "a1", "name": "Sol Ring", "layout": "normal",
+            "image_uris": {"png": "https://img/a1.png"}, "oracle_text": "{T}: Add {C}{C}."}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(card_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = CardCache(tmp_path / "cards.sqlite3", ttl=100)
+    cache.put(name_key("solring"), SOL_RING)
+    hit, card = cache.get(name_key("solring"))
+    assert hit and card["name"] == "Sol Ring"
+    assert "oracle_text" not in card   # slimmed to the fields the pipeline uses
+
+    # Another worker's connection sees the same entry.
+    assert CardCache(tmp_path / "cards.sqlite3").get(name_key("solring"))[0]
+
+    clock[0] += 101
+    assert cache.get(name_key("solring")) == (False, None)
+
+
+def test_negative_entries_have_their_own_ttl(tmp_path, clock):
+    cache = CardCache(tmp_path / "cards.sqlite3", ttl=1000, negative_ttl=10)
+    cache.put(name_key("notacard"), None)
+    cache.put(name_key("solring"), SOL_RING)
+    assert cache.get(name_key("notacard")) == (True, None)
+
+    clock[0] += 11
+    assert cache.get(name_key("notacard")) == (False, None)
+    assert cache.get(name_key("solring"))[0]
+    stats = cache.stats()
+    assert (stats["hits"], stats["negative_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_evict_drops_expired_then_soonest_to_expire(tmp_path, clock):
+    cache = CardCache(tmp_path / "cards.sqlite3", max_entries=2)
+    cache.put("k:expired", {"x": 1}, ttl=5, slim=False)
+    cache.put("k:soon", {"x": 2}, ttl=50, slim=False)
+    cache.put("k:later", {"x": 3}, ttl=500, slim=False)
+    cache.put("k:latest", {"x": 4}, ttl=5000, slim=False)
+    clock[0] += 10
+
+    assert cache.evict() == 2
+    assert [cache.get(k)[0] for k in ("k:expired", "k:soon", "k:later", "k:latest")] == \
+        [False, False, True, True]
@@ -0,0 +1,79 @@
+"""Local fuzzy name matching."""
+
+import random
+
+import pytest
+
+from fuzzy import LOW_CONFIDENCE, IndexedNameMatcher, Match, NameMatcher, levenshtein
+from names import normalise
+
+NAMES = ["Sol Ring", "Lightning Bolt", "Counterspell", "Fire // Ice", "Fire", "Ice",
+         "Jace, the Mind Sculptor", "Lim-Dûl's Vault", "Brazen Borrower", "Petty Theft"]
+
+
+def _reference(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return row[-1]
+
+
+def test_levenshtein_matches_the_textbook_algorithm():
+    rng = random.Random(7)
+    for _ in range(300):
+        a = "".join(rng.choices("abcde", k=rng.randrange(0, 90)))
+        b = "".join(rng.choices("abcde", k=rng.randrange(0, 90)))
+        assert levenshtein(a, b) == _reference(a, b), (a, b)
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return NameMatcher(normalise(n) for n in NAMES)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Sol Ring", "solring"),                      # exact
+    ("Lightning Bolts", "lightningbolt"),         # extra letter
+    ("Lightnig Bolt", "lightningbolt"),           # missing letter
+    ("Counter Spell", "counterspell"),            # spacing is normalised away
+    ("Jace the Mind Sculpter", "jacethemindsculptor"),
+    ("Brazen Borower", "brazenborrower"),
+])
+def test_typos_resolve(matcher, query, expected):
+    match = matcher.match(normalise(query))
+    assert match.key == expected
+    assert match.confidence >= LOW_CONFIDENCE
+
+
+def test_exact_and_face_names(matcher):
+    assert matcher.match("fire") == Match("fire", 1.0)
+    assert matcher.match("fireice") == Match("fireice", 1.0)
+
+
+def test_weak_and_missing_matches(matcher):
+    weak = matcher.match(normalise("Lightn Bt"))
+    assert weak is not None and weak.key == "lightningbolt" and weak.confidence < LOW_CONFIDENCE
+    assert matcher.match(normalise("Black Lotus")) is None
+    assert matcher.match("") is None
+
+
+def test_indexed_matcher_follows_the_bulk_index():
+    class Bulk:
+        snapshot, names_ = None, []
+
+        def version(self):
+            return self.snapshot
+
+        def names(self):
+            return self.names_
+
+    bulk = Bulk()
+    indexed = IndexedNameMatcher(bulk)
+    assert indexed.match("solring") is None   # no index ingested yet
+
+    bulk.snapshot, bulk.names_ = "v1", ["solring"]
+    assert indexed.match("solrign").key == "solring"
+    bulk.snapshot, bulk.names_ = "v2", ["counterspell"]
+    assert indexed.match("counterspel").key == "counterspell"
@@ -0,0 +1,69 @@
+"""Malformed upstream responses fail one card, never the whole deck."""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+CORRUPT_GZIP = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\x03not deflate data"
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    """Scryfall stand-in that answers every lookup with `server.mode`."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="application/json", gzip=False):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._send(b"<html>Bad gateway</html>", "text/html")
+
+    def do_GET(self):
+        mode, base = self.server.mode, f"http://127.0.0.1:{self.server.server_port}"
+        if self.path.startswith("/img/"):
+            return self._send(CORRUPT_GZIP, "image/png", gzip=True)
+        if mode == "html":
+            return self._send(b"<html>Bad gateway</html>", "text/html")
+        if mode == "gzip":
+            return self._send(CORRUPT_GZIP, gzip=True)
+        name = self.path.rsplit("=", 1)[-1]
+        self._send(json.dumps({"object": "card", "id": name, "name": name, "layout": "normal",
+                               "image_uris": {"png": f"{base}/img/{name}.png"}}).encode())
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(main, "SCRYFALL_API", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(main.HTTP, "retries", 0)
+    yield server
+    server.shutdown()
+
+
+@pytest.mark.parametrize("mode", ["html", "gzip", "image"])
+def test_malformed_response_is_a_card_error(upstream, mode):
+    upstream.mode = mode
+    deck = f"1 Sol Ring {mode}\n1 Island {mode}"
+    fronts, _, report, summary = asyncio.run(main.fetch_all_cards(deck))
+
+    assert fronts == [None, None]
+    assert summary["errors"] == 2
+    for entry in report:
+        assert entry["status"] == "error"
+        assert entry["reason"].startswith(main.TRANSIENT_REASON)
@@ -0,0 +1,37 @@
+"""Shared on-disk image store: content addressing and LRU eviction."""
+
+import os
+import time
+
+from image_store import ImageStore
+
+
+def _age(store, url, seconds):
+    blob = store.path(url)
+    os.utime(blob, (time.time() - seconds,) * 2)
+
+
+def test_blobs_are_content_addressed(tmp_path):
+    store = ImageStore(tmp_path)
+    assert store.put("https://img/a.png?1", b"same") == store.put("https://img/b.png?1", b"same")
+    assert len(list((tmp_path / "blobs").glob("*/*"))) == 1
+    assert store.get("https://img/a.png?1") == b"same"
+    assert store.get("https://img/a.png?2") is None   # a re-scan is a new URL
+
+    path = store.get_path("https://img/b.png?1")
+    assert path.read_bytes() == b"same"
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["bytes_served"]) == (2, 1, 8)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    store = ImageStore(tmp_path, max_bytes=3000)
+    for i, url in enumerate(("a", "b", "c")):
+        store.put(url, bytes([i]) * 1000)
+    for url, age in (("a", 300), ("b", 200), ("c", 100)):
+        _age(store, url, age)
+    assert store.get("a") is not None   # reading "a" makes it the most recent
+
+    store.put("d", b"d" * 1000)         # 4000 bytes: evict down to 90% of the budget
+    assert [store.get(u) is not None for u in "abcd"] == [True, False, False, True]
+    assert store.stats()["evictions"] == 2
@@ -0,0 +1,34 @@
+"""Background jobs: the event log a follower sees."""
+
+import asyncio
+
+from jobs import JobManager
+
+
+def _follow(tmp_path, runner):
+    async def run():
+        jobs = JobManager(tmp_path)
+        job  = jobs.submit("pdf", ".pdf", "application/pdf", "proxies.pdf", runner)
+        return job, [event async for event in job.follow() if event is not None]
+    return asyncio.run(run())
+
+
+def test_done_is_the_last_event(tmp_path):
+    async def runner(job, tmp):
+        job.emit("card", {"index": 0})
+        tmp.write_bytes(b"%PDF-")
+        job.summary = {"ok": 1}
+
+    job, events = _follow(tmp_path, runner)
+    assert [name for name, _ in events] == ["status", "status", "card", "done"]
+    assert events[-1] == ("done", {"ok": 1})
+    assert job.path.read_bytes() == b"%PDF-"
+
+
+def test_failed_is_the_last_event(tmp_path):
+    async def runner(job, tmp):
+        raise ValueError("No cards were successfully downloaded.")
+
+    job, events = _follow(tmp_path, runner)
+    assert events[-1] == ("failed", {"detail": "No cards were successfully downloaded."})
+    assert job.status == "failed" and not job.path.exists()
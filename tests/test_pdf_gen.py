@@ -0,0 +1,220 @@
+"""PDF rendering: page planning, output structure, labels, the tile cache and the render pool."""
+
+import re
+import threading
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import pdf_gen
+from image_store import ImageStore
+
+
+def _image(fmt, mode="RGB", color=(200, 40, 40)):
+    buf = BytesIO()
+    Image.new(mode, (60, 84), color if mode == "RGB" else 128).save(buf, fmt)
+    return buf.getvalue()
+
+
+RGB_JPEG  = _image("JPEG")
+GRAY_JPEG = _image("JPEG", "L")
+PNG       = _image("PNG", color=(20, 90, 200))
+
+# 19 cards on 3 sheets; the first two front sheets are identical and only
+# the last sheet has a card with its own back, so every sheet gets a back
+# page (6 pages) and the first two backs are identical (empty).
+FRONTS = [RGB_JPEG] * 16 + [PNG, GRAY_JPEG, b"not an image"]
+BACKS  = [None] * 16 + [RGB_JPEG, None, None]
+
+
+def parse_pdf(data: bytes) -> dict[int, bytes]:
+    """{object number: "N 0 obj … endobj" bytes}, checked against the xref table."""
+    assert data.startswith(b"%PDF-1.4\n") and data.endswith(b"%%EOF\n")
+    xref_at = int(data[data.rindex(b"startxref\n") + len(b"startxref\n"):].split()[0])
+    lines = data[xref_at:].split(b"\n")
+    assert lines[0] == b"xref"
+    first, size = map(int, lines[1].split())
+    assert first == 0
+    entries = lines[2:2 + size]
+    assert entries[0] == b"0000000000 65535 f "
+    trailer = b"\n".join(lines[2 + size:])
+    assert int(re.search(rb"/Size (\d+)", trailer)[1]) == size
+
+    offsets = {}
+    for num, entry in enumerate(entries[1:], 1):
+        offset, gen, kind = entry.split()
+        assert (gen, kind) == (b"00000", b"n")
+        offsets[num] = int(offset)
+        assert data.startswith(f"{num} 0 obj\n".encode(), offsets[num])
+    ends = sorted(offsets.values()) + [xref_at]
+    objects = {}
+    for num, start in offsets.items():
+        body = data[start:ends[ends.index(start) + 1]]
+        assert body.endswith(b"endobj\n")
+        length = re.search(rb"/Length (\d+) >>\nstream\n", body)
+        if length:
+            stream_at = length.end()
+            assert body[stream_at + int(length[1]):] == b"\nendstream\nendobj\n"
+        objects[num] = body
+    return objects
+
+
+def stream(obj: bytes) -> bytes:
+    return obj[obj.index(b"\nstream\n") + 8:-len(b"\nendstream\nendobj\n")]
+
+
+@pytest.mark.parametrize("backend, images", [
+    ("raster", 4),   # one full-page JPEG per distinct sheet side
+    ("embed", 3),    # one XObject per decodable card image
+])
+def test_pdf_structure(backend, images):
+    plan = pdf_gen.plan_sheets(FRONTS, BACKS)
+    assert len(plan) == 6
+    data = b"".join(pdf_gen.iter_pdf(FRONTS, BACKS, workers=1, backend=backend))
+    objects = parse_pdf(data)
+
+    # font + images + (content stream + page) per page + page tree + catalog
+    assert len(objects) == 1 + images + 2 * len(plan) + 2
+    pages = objects[2]
+    kids = [int(n) for n in re.findall(rb"(\d+) 0 R", pages)]
+    assert int(re.search(rb"/Count (\d+)", pages)[1]) == len(kids) == len(plan)
+    assert all(b"/Type /Page " in objects[k] for k in kids)
+    assert b"/Pages 2 0 R" in objects[1]
+
+    xobjects = [o for o in objects.values() if b"/Subtype /Image" in o]
+    assert len(xobjects) == images
+    for obj in xobjects:
+        with Image.open(BytesIO(stream(obj))) as im:
+            assert im.format == "JPEG"
+
+
+def test_embed_passes_jpegs_through():
+    objects = parse_pdf(b"".join(pdf_gen.iter_pdf(FRONTS, BACKS, workers=1, backend="embed")))
+    xobjects = [o for o in objects.values() if b"/Subtype /Image" in o]
+    assert stream(xobjects[0]) == RGB_JPEG
+    gray = [o for o in xobjects if b"/DeviceGray" in o]
+    assert [stream(o) for o in gray] == [GRAY_JPEG]
+    # The undecodable image is a grey placeholder rectangle, not an XObject.
+    contents = b"".join(objects.values())
+    assert contents.count(b"0.149 0.149 0.2 rg") == 1
+
+
+def test_tile_cache_accounting():
+    """Tiles are charged at 4 bytes per pixel and evicted least recently used first."""
+    cache = pdf_gen.TileCache(max_bytes=2 * 10 * 10 * 4)
+    tiles = {k: Image.new("RGB", (10, 10), c) for k, c in (("a", "red"), ("b", "green"), ("c", "blue"))}
+    cache.put("a", tiles["a"])
+    cache.put("b", tiles["b"])
+    assert cache.get("a", (10, 10)) is tiles["a"]   # "a" is now the most recent
+    cache.put("c", tiles["c"])                      # evicts "b"
+    assert cache.get("b", (10, 10)) is None
+    assert cache.get("c", (10, 10)) is tiles["c"]
+    cache.put("huge", Image.new("RGB", (20, 20)))   # over budget on its own: not kept
+    assert cache.stats() == {"hits": 2, "disk_hits": 0, "misses": 1, "tiles": 2, "bytes": 800}
+
+
+def test_tile_cache_disk_tier(tmp_path):
+    tile = Image.new("RGB", (10, 10), "red")
+    pdf_gen.TileCache(1 << 20, disk=ImageStore(tmp_path)).put("a", tile)
+    cache = pdf_gen.TileCache(1 << 20, disk=ImageStore(tmp_path))
+    assert cache.get("a", (10, 10)).tobytes() == tile.tobytes()
+    assert cache.stats()["disk_hits"] == 1
+
+
+@pytest.mark.parametrize("backend", ["raster", "embed"])
+def test_parallel_output_is_byte_identical(backend):
+    serial   = b"".join(pdf_gen.iter_pdf(FRONTS, BACKS, workers=1, backend=backend))
+    parallel = b"".join(pdf_gen.iter_pdf(FRONTS, BACKS, workers=4, backend=backend))
+    assert parallel == serial
+
+
+def test_render_pool_is_shared(monkeypatch):
+    """Concurrent requests together never render more than RENDER_WORKERS sheets at once."""
+    lock, active, peak = threading.Lock(), [0], [0]
+    render = pdf_gen._render_sheet
+
+    def counting(*args):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        try:
+            return render(*args)
+        finally:
+            with lock:
+                active[0] -= 1
+    monkeypatch.setattr(pdf_gen, "_render_sheet", counting)
+
+    decks = [[_image("JPEG", color=(i, 0, 0))] * 8 + [_image("JPEG", color=(0, i, 0))] * 8
+             for i in range(4)]
+    threads = [threading.Thread(target=lambda d=d: b"".join(pdf_gen.iter_pdf(d, [None] * 16)))
+               for d in decks]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert 1 <= peak[0] <= pdf_gen.RENDER_WORKERS
+
+
+def test_long_labels_stay_on_the_page():
+    notes = pdf_gen.deck_notes([("A" * 300, 3), ("B" * 300, 5)])
+    assert notes == [f"{'A' * 37}... 1-3, {'B' * 37}... 4-8"]
+
+    op = pdf_gen._pdf_label(pdf_gen._sheet_label(0, False, ["x" * 2000]))
+    x_pt, text = re.search(r"([\d.]+) [\d.]+ Td \((.*)\) Tj", op).groups()
+    assert text.endswith("...")
+    left  = float(x_pt) / pdf_gen._PT
+    width = len(text) * pdf_gen._LABEL_FONT_PX * 0.6
+    assert left >= pdf_gen.REG_INSET_PX
+    assert left + width <= pdf_gen.PAGE_W_PX - pdf_gen.REG_INSET_PX
+
+
+def _sides(plan):
+    return [(s.page_num, "back" if s.is_back else "front", len(s.cards)) for s in plan]
+
+
+@pytest.mark.parametrize("backs, pages", [
+    ("auto", [(0, "front", 3)]),
+    ("all",  [(0, "front", 3), (0, "back", 0)]),
+    ("none", [(0, "front", 3)]),
+])
+def test_plan_single_faced_deck(backs, pages):
+    assert _sides(pdf_gen.plan_sheets([b"a", b"b", b"c"], [None] * 3, backs=backs)) == pages
+
+
+def test_plan_backs_are_mirrored():
+    plan = pdf_gen.plan_sheets([b"a", b"dfc", b"c", b"d", b"e"], [None, b"dfc-back", None, None, None])
+    assert _sides(plan) == [(0, "front", 5), (0, "back", 1)]
+    assert plan[1].cards == [(2, b"dfc-back")]   # slot 1 of row 0 → column 2 when flipped
+    assert _sides(pdf_gen.plan_sheets([b"a", b"dfc"], [None, b"x"], backs="none")) == [(0, "front", 2)]
+
+
+def test_plan_generic_back_fills_every_slot():
+    plan = pdf_gen.plan_sheets([b"a", b"dfc"], [None, b"x"], generic_back=b"g")
+    assert plan[1].cards == [(3, b"g"), (2, b"x")]
+
+
+def test_plan_group_flips():
+    fronts = [b"dfc1"] + [bytes([i]) for i in range(9)] + [b"dfc2"]
+    backs  = [b"back1"] + [None] * 9 + [b"back2"]
+    assert _sides(pdf_gen.plan_sheets(fronts, backs)) == [
+        (0, "front", 8), (0, "back", 1), (1, "front", 3), (1, "back", 1)]
+
+    # Flips move to the end: the first sheet needs no back, only the second is duplex.
+    plan = pdf_gen.plan_sheets(fronts, backs, group_flips=True)
+    assert _sides(plan) == [(0, "front", 8), (1, "front", 3), (1, "back", 2)]
+    assert [src for _, src in plan[1].cards][1:] == [b"dfc1", b"dfc2"]
+    # "all" keeps every back; a generic back disables the regrouping.
+    assert len(pdf_gen.plan_sheets(fronts, backs, backs="all", group_flips=True)) == 4
+    assert pdf_gen.plan_sheets(fronts, backs, b"g", group_flips=True)[0].cards[0] == (0, b"dfc1")
+
+
+def test_plan_identical_sheets_share_a_key():
+    plan = pdf_gen.plan_sheets([b"island"] * 16 + [b"x"], [None] * 17, generic_back=b"g")
+    keys = [s.key for s in plan]
+    assert keys[0] == keys[2] and keys[1] == keys[3]   # both full sheets, front and back
+    assert len(set(keys)) == 4
+    with pytest.raises(ValueError):
+        pdf_gen.plan_sheets([b"a"], [None], backs="sometimes")
@@ -0,0 +1,66 @@
+"""Finished-artifact cache: storage, versions, temp files and conditional requests."""
+
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from result_cache import ResultCache
+
+
+def _files(root):
+    return sorted(p.name for p in root.rglob("*") if p.is_file())
+
+
+def test_store_and_lookup(tmp_path):
+    cache = ResultCache(tmp_path)
+    with cache.open("k" * 64, "v1", {"media_type": "application/pdf"}) as pending:
+        pending.write(b"%PDF-")
+    hit = cache.get("k" * 64, "v1")
+    assert hit.path.read_bytes() == b"%PDF-"
+    assert hit.etag == cache.etag("k" * 64, "v1")
+    assert hit.meta["media_type"] == "application/pdf"
+    assert cache.get("k" * 64, "v2") is None
+    assert cache.stats()["stale"] == 1
+
+
+def test_pending_result_is_lazy_and_cleans_up(tmp_path):
+    cache = ResultCache(tmp_path)
+    cache.open("a" * 64, "v1")          # never entered: e.g. the client left first
+    assert _files(tmp_path) == []
+
+    with pytest.raises(RuntimeError):
+        with cache.open("a" * 64, "v1") as pending:
+            pending.write(b"partial")
+            raise RuntimeError("stream aborted")
+    assert _files(tmp_path) == []
+    assert cache.get("a" * 64, "v1") is None
+
+
+def test_evict_sweeps_abandoned_temp_files(tmp_path):
+    cache = ResultCache(tmp_path)
+    old, fresh = tmp_path / ".tmp-old", tmp_path / ".tmp-fresh"
+    old.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    os.utime(old, (time.time() - 2 * 3600,) * 2)
+    cache.evict()
+    assert _files(tmp_path) == [".tmp-fresh"]
+
+
+def test_download_is_served_from_cache(scryfall):
+    deck = {"deck_list": "2 Island\n1 Plains", "ppi": "72"}
+    hits = main.RESULT_CACHE.stats()["hits"]
+    with TestClient(main.app) as client:
+        first = client.post("/api/download", data=deck)
+        assert first.status_code == 200 and first.headers["etag"]
+
+        again = client.post("/api/download", data=deck, headers={"If-None-Match": first.headers["etag"]})
+        assert again.status_code == 304 and not again.content
+
+        third = client.post("/api/download", data=deck)
+        assert third.status_code == 200
+        assert third.content == first.content
+        assert third.headers["etag"] == first.headers["etag"]
+    assert main.RESULT_CACHE.stats()["hits"] == hits + 2
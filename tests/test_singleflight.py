@@ -0,0 +1,82 @@
+"""Request coalescing: concurrent calls for one key share a single run."""
+
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _concurrently(flights, fn):
+    """Run flights.do("key", fn) from CALLERS threads; fn may only finish once all joined."""
+    outcomes = [None] * CALLERS
+
+    def call(i):
+        try:
+            outcomes[i] = ("ok", flights.do("key", fn))
+        except Exception as e:
+            outcomes[i] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(CALLERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return outcomes
+
+
+def test_concurrent_calls_run_once():
+    flights, calls = SingleFlight(), []
+
+    def fetch():
+        calls.append(1)
+        _wait_for(lambda: flights.stats()["coalesced"] == CALLERS - 1)
+        return {"name": "Sol Ring"}
+
+    outcomes = _concurrently(flights, fetch)
+    assert len(calls) == 1
+    assert all(o == ("ok", {"name": "Sol Ring"}) for o in outcomes)
+    assert all(o[1] is outcomes[0][1] for o in outcomes)
+    assert flights.stats() == {"leaders": 1, "coalesced": CALLERS - 1, "errors": 0, "in_flight": 0}
+
+    # Nothing is remembered once the call is over.
+    assert flights.do("key", lambda: "again") == "again"
+
+
+def test_followers_get_the_leaders_error():
+    flights = SingleFlight()
+
+    def fetch():
+        _wait_for(lambda: flights.stats()["coalesced"] == CALLERS - 1)
+        raise ValueError("upstream down")
+
+    outcomes = _concurrently(flights, fetch)
+    assert {kind for kind, _ in outcomes} == {"error"}
+    assert len({id(e) for _, e in outcomes}) == 1
+    assert flights.stats()["errors"] == 1
+
+
+def test_begin_and_finish():
+    flights = SingleFlight()
+    lead, is_leader = flights.begin("a")
+    follow, is_follower_leader = flights.begin("a")
+    other, other_leads = flights.begin("b")
+    assert (is_leader, is_follower_leader, other_leads) == (True, False, True)
+    assert follow is lead and other is not lead
+
+    flights.finish("a", lead, result=42)
+    assert follow.wait() == 42
+    flights.finish("b", other, error=KeyError("b"))
+    with pytest.raises(KeyError):
+        other.wait()
+    assert flights.stats()["in_flight"] == 0
@@ -0,0 +1,37 @@
+"""The streamed proxies.zip is a valid archive."""
+
+import asyncio
+import io
+import json
+import zipfile
+
+from PIL import Image
+
+import main
+
+
+def test_iter_zip_is_a_valid_archive(scryfall):
+    single, flip = scryfall.catalog.cards[-2]["name"], scryfall.catalog.cards[-1]["name"]
+    deck = f"2 Island\n1 {single}\n1 {flip}\n1 Definitely Not A Card"
+
+    async def collect():
+        cards, chunks = [], []
+        async for chunk in main.iter_zip(main.expand_deck(deck), lambda i, e: cards.append(i),
+                                         tiers=("small",)):
+            chunks.append(chunk)
+        return cards, chunks
+    cards, chunks = asyncio.run(collect())
+    assert cards == [0, 1, 2, 3, 4]
+    assert len(chunks) > 1   # streamed entry by entry, not built whole
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.testzip() is None
+        names = zf.namelist()
+        report = json.loads(zf.read("_report.json"))
+        images = [n for n in names if n != "_report.json"]
+        assert len(images) == len(set(images)) == 5   # 4 fronts + 1 back
+        assert sum(n.startswith("backs/") for n in images) == 1
+        for name in images:
+            with Image.open(zf.open(name)) as im:
+                assert im.size == (146, 204)
+    assert [r["status"] == "error" for r in report] == [False, False, False, False, True]